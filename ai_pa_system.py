@@ -1,6 +1,23 @@
+import os
+from datetime import date, timedelta
+
 import streamlit as st
-import sqlite3
-from datetime import datetime, timedelta
+
+import pa_archive
+import pa_backup
+import pa_columnar
+import pa_perf
+import pa_urgent
+from pa_cards import task_cards, session_cards, mock_cards, search_cards, plan_cards, archive_cards
+from pa_scheduler import study_plan
+from pa_trends import CLARITY_WINDOW_DAYS, MOCK_WINDOW, get_trends
+from pa_db import (
+    BAR_SUBJECTS, WORK_TASK_TYPES, BAR_TASK_TYPES, PRIORITIES, MOCK_EXAM_TYPES, SEARCH_CANDIDATES,
+    init_db, add_task, get_task_page,
+    complete_tasks, log_study, log_mock, get_study_progress, get_mock_scores,
+    get_weak_subjects, get_subject_hours, get_dashboard_snapshot, search, use_user, get_mock_subject_stats,
+    get_completed_count, get_archive_page, current_path, scoped, analytics_summary, undo,
+)
 
 # Set page config
 st.set_page_config(
@@ -9,8 +26,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Per-rerun timings; a no-op unless AI_PA_PERF=1 or ?perf=1.
+perf = pa_perf.start_rerun(pa_perf.enabled(st.experimental_get_query_params()))
+
 # ==================== MODERN, TRENDY CSS ====================
 
+perf.mark("css")
+
 st.markdown("""
 <style>
 /* Global styles */
@@ -80,6 +102,14 @@ body {
     background: linear-gradient(135deg, #1e293b 0%, #2d3e52 100%);
 }
 
+/* Search matches */
+.task-card mark {
+    background: rgba(99, 102, 241, 0.45);
+    color: #ffffff;
+    border-radius: 4px;
+    padding: 0 3px;
+}
+
 /* Work tasks - Green accent */
 .work-task {
     border-left: 6px solid #10b981;
@@ -355,141 +385,116 @@ label {
 </style>
 """, unsafe_allow_html=True)
 
-# ==================== DATABASE ====================
-
-def init_db():
-    """Initialize database"""
-    conn = sqlite3.connect('ai_pa.db')
-    c = conn.cursor()
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY,
-        title TEXT,
-        description TEXT,
-        category TEXT,
-        task_type TEXT,
-        due_date TEXT,
-        priority TEXT,
-        status TEXT,
-        created_date TEXT
-    )''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS study_progress (
-        id INTEGER PRIMARY KEY,
-        subject TEXT,
-        date TEXT,
-        hours_spent REAL,
-        clarity_rating INTEGER,
-        notes TEXT
-    )''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS mock_scores (
-        id INTEGER PRIMARY KEY,
-        exam_type TEXT,
-        score INTEGER,
-        total_points INTEGER,
-        date TEXT,
-        notes TEXT
-    )''')
-    
-    conn.commit()
-    return conn
-
-# ==================== TASK FUNCTIONS ====================
-
-def add_task(title, description, task_type, due_date, priority):
-    conn = init_db()
-    c = conn.cursor()
-    category = "Work" if task_type.startswith("Work") else "Bar Prep"
-    c.execute('''INSERT INTO tasks 
-                 (title, description, category, task_type, due_date, priority, status, created_date)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-              (title, description, category, task_type, due_date, priority, 'pending', datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
-
-def get_all_tasks():
-    conn = init_db()
-    c = conn.cursor()
-    c.execute('SELECT * FROM tasks WHERE status = "pending" ORDER BY due_date ASC')
-    tasks = c.fetchall()
-    conn.close()
-    return tasks
-
-def get_tasks_by_type(task_type):
-    conn = init_db()
-    c = conn.cursor()
-    if task_type == "work":
-        c.execute('SELECT * FROM tasks WHERE category = "Work" AND status = "pending" ORDER BY due_date ASC')
-    elif task_type == "bar":
-        c.execute('SELECT * FROM tasks WHERE category = "Bar Prep" AND status = "pending" ORDER BY due_date ASC')
-    tasks = c.fetchall()
-    conn.close()
-    return tasks
-
-def get_urgent_tasks():
-    conn = init_db()
-    c = conn.cursor()
-    today = datetime.now().date()
-    three_days = today + timedelta(days=3)
-    c.execute('''SELECT * FROM tasks 
-                 WHERE status = "pending" AND due_date BETWEEN ? AND ?
-                 ORDER BY due_date ASC''',
-              (str(today), str(three_days)))
-    tasks = c.fetchall()
-    conn.close()
-    return tasks
-
-def complete_task(task_id):
-    conn = init_db()
-    c = conn.cursor()
-    c.execute('UPDATE tasks SET status = ? WHERE id = ?', ('completed', task_id))
-    conn.commit()
-    conn.close()
-
-# ==================== STUDY FUNCTIONS ====================
-
-def log_study(subject, hours, clarity, notes):
-    conn = init_db()
-    c = conn.cursor()
-    c.execute('''INSERT INTO study_progress 
-                 (subject, date, hours_spent, clarity_rating, notes)
-                 VALUES (?, ?, ?, ?, ?)''',
-              (subject, datetime.now().isoformat(), hours, clarity, notes))
-    conn.commit()
-    conn.close()
-
-def log_mock(exam_type, score, total, notes):
-    conn = init_db()
-    c = conn.cursor()
-    c.execute('''INSERT INTO mock_scores 
-                 (exam_type, score, total_points, date, notes)
-                 VALUES (?, ?, ?, ?, ?)''',
-              (exam_type, score, total, datetime.now().isoformat(), notes))
-    conn.commit()
-    conn.close()
-
-def get_study_progress():
-    conn = init_db()
-    c = conn.cursor()
-    c.execute('SELECT * FROM study_progress ORDER BY date DESC LIMIT 20')
-    progress = c.fetchall()
-    conn.close()
-    return progress
-
-def get_weak_subjects():
-    conn = init_db()
-    c = conn.cursor()
-    c.execute('''SELECT subject, AVG(clarity_rating) as avg_clarity, COUNT(*) as sessions
-                 FROM study_progress 
-                 GROUP BY subject 
-                 ORDER BY avg_clarity ASC''')
-    weak = c.fetchall()
-    conn.close()
-    return weak
+# ==================== PAGE SETTINGS ====================
+
+# Hosted for several people: each session names a profile and gets that
+# profile's own database shard. There is no password: anyone who types a
+# name opens that profile, so this separates data, it doesn't protect it.
+MULTI_USER = os.environ.get("AI_PA_MULTI_USER", "").lower() in ("1", "true", "yes")
+
+STUDY_PLAN_SIZE = 3
+
+# How much of each trend series the Analytics charts draw.
+TREND_DAYS = 180
+TREND_WEEKS = 52
+TREND_MOCKS = 200
+
+# Date-range presets for the Analytics totals: days back from today.
+ANALYTICS_RANGES = {"All time": None, "Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90}
+
+def analytics_range():
+    """(start, end) dates picked above the Analytics totals; None is open."""
+    choice = st.selectbox("📅 Date range", [*ANALYTICS_RANGES, "Custom"], key="analytics_range")
+    today = date.today()
+    if choice != "Custom":
+        days = ANALYTICS_RANGES[choice]
+        return (today - timedelta(days=days - 1), today) if days else (None, None)
+    picked = st.date_input("From / to", value=(today - timedelta(days=29), today), key="analytics_dates")
+    # Mid-selection the picker holds only the start date.
+    return (picked[0], picked[1]) if len(picked) == 2 else (picked[0], None)
+
+# ==================== PAGINATION ====================
+
+PAGE_SIZES = [10, 25, 50, 100]
+SEARCH_PAGE_SIZE = 20
+ARCHIVE_PAGE_SIZE = 25
+
+def reset_search_page():
+    st.session_state["search_offset"] = 0
+
+def archive_page():
+    """One page of archived tasks, fetched only when the Archive page is open."""
+    cursor = st.session_state.setdefault("archive_cursor", {})
+    page = get_archive_page(ARCHIVE_PAGE_SIZE, **cursor)
+    col_newer, col_older = st.columns(2)
+    with col_newer:
+        if st.button("← Newer", key="archive_newer", disabled=not page["has_newer"]):
+            st.session_state["archive_cursor"] = {"newer": page["first_key"]}
+            st.rerun()
+    with col_older:
+        if st.button("Older →", key="archive_older", disabled=not page["has_older"]):
+            st.session_state["archive_cursor"] = {"older": page["last_key"]}
+            st.rerun()
+    return page
+
+def reset_task_page(key):
+    st.session_state[f"{key}_cursor"] = {}
+
+def task_page(task_type, key):
+    """Fetch only the visible page of a task list, keyed on (due_date, id)."""
+    cursor = st.session_state.setdefault(f"{key}_cursor", {})
+    page_size = st.selectbox("Tasks per page", PAGE_SIZES, key=f"{key}_size",
+                             on_change=reset_task_page, args=(key,))
+    page = get_task_page(task_type, page_size, **cursor)
+    if cursor and not page["rows"]:
+        # Everything on this page was completed; fall back to the first page.
+        reset_task_page(key)
+        st.rerun()
+    return page
+
+def task_page_nav(page, key):
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        if st.button("← Previous", key=f"{key}_prev", disabled=not page["has_prev"]):
+            st.session_state[f"{key}_cursor"] = {"before": page["first_key"]}
+            st.rerun()
+    with col_next:
+        if st.button("Next →", key=f"{key}_next", disabled=not page["has_next"]):
+            st.session_state[f"{key}_cursor"] = {"after": page["last_key"]}
+            st.rerun()
+
+# ==================== BULK COMPLETION ====================
+
+def complete_chosen(key, path):
+    # Runs before the next rerun draws the list, so completed tasks are gone
+    # without a second rerun. Callbacks run ahead of the USER section, hence
+    # the explicit database.
+    chosen = st.session_state.get(f"{key}_chosen")
+    if chosen:
+        with scoped(path):
+            complete_tasks(chosen)
+
+def undo_last(path):
+    # A callback for the same reason as complete_chosen.
+    with scoped(path):
+        result = undo(1)
+    if result["skipped"]:
+        st.session_state["undo_message"] = (f"Couldn't undo: {result['skipped'][0]}. "
+                                            "Skipped it; undo again to go further back.")
+    else:
+        st.session_state["undo_message"] = "↩️ Undid the last action." if result["undone"] else "Nothing to undo."
+
+def completion_form(key, tasks):
+    """One completion control per list, completing every pick in one transaction."""
+    titles = {task[0]: task[1] for task in tasks}
+    with st.form(f"{key}_done", clear_on_submit=True):
+        st.multiselect("✓ Mark complete", list(titles), format_func=titles.get, key=f"{key}_chosen")
+        st.form_submit_button("✓ Complete selected", on_click=complete_chosen, args=(key, current_path()))
 
 # ==================== MAIN APP ====================
 
+perf.mark("header")
+
 # Header
 st.markdown("""
 <div class="header-container">
@@ -498,35 +503,70 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ==================== USER ====================
+
+# Every data call below this point runs against the profile chosen here.
+# It lives only in the session, never in the URL.
+if MULTI_USER:
+    user_id = st.session_state.get("user_id")
+    if not user_id:
+        with st.form("sign_in"):
+            name = st.text_input("👤 Profile name")
+            st.caption("Profiles keep each person's data apart; they are not accounts. "
+                       "There is no password, so anyone who enters the same name opens the same profile.")
+            if st.form_submit_button("Continue") and name.strip():
+                st.session_state["user_id"] = name.strip()
+                st.rerun()
+        st.stop()
+    use_user(user_id)
+    with st.sidebar:
+        st.caption(f"👤 Profile: {user_id} (not password-protected)")
+        if st.button("Switch profile"):
+            del st.session_state["user_id"]
+            st.rerun()
+else:
+    use_user(None)
+
 # Sidebar Navigation
 with st.sidebar:
     st.markdown("<h2 style='color: #e0e7ff; font-weight: 900; text-align: center; letter-spacing: 1px;'>📍 NAVIGATION</h2>", unsafe_allow_html=True)
     page = st.radio("", 
-        ["📊 Dashboard", "💼 Work Tasks", "📚 Bar Prep", "📈 Analytics"],
+        ["📊 Dashboard", "💼 Work Tasks", "📚 Bar Prep", "📈 Analytics", "🔍 Search", "🗄️ Archive"],
         label_visibility="collapsed"
     )
 
 init_db()
+pa_urgent.start()
+pa_archive.start()
+pa_backup.start()
+if pa_columnar.ENABLED:
+    pa_columnar.enable()
+
+# Fetched once per rerun and shared with the sidebar Quick Stats. Pages that
+# write (forms) leave it unset so the sidebar reads fresh numbers afterwards.
+snapshot = None
+
+perf.mark("page")
 
 # ==================== DASHBOARD ====================
 
 if page == "📊 Dashboard":
     
-    all_tasks = get_all_tasks()
-    work_tasks = get_tasks_by_type("work")
-    bar_tasks = get_tasks_by_type("bar")
-    urgent = get_urgent_tasks()
+    snapshot = get_dashboard_snapshot()
+    work_tasks = snapshot["work"]
+    bar_tasks = snapshot["bar"]
+    urgent = pa_urgent.urgent_tasks()
     
     st.markdown("<h2 class='section-header'>📊 Dashboard Overview</h2>", unsafe_allow_html=True)
     
     col1, col2, col3, col4 = st.columns(4, gap="large")
     
     with col1:
-        st.metric("📋 Total Tasks", len(all_tasks))
+        st.metric("📋 Total Tasks", snapshot["pending_count"])
     with col2:
-        st.metric("💼 Work", len(work_tasks))
+        st.metric("💼 Work", snapshot["work_count"])
     with col3:
-        st.metric("📚 Bar Prep", len(bar_tasks))
+        st.metric("📚 Bar Prep", snapshot["bar_count"])
     with col4:
         st.metric("⚠️ Urgent", len(urgent))
     
@@ -536,14 +576,12 @@ if page == "📊 Dashboard":
     if urgent:
         st.markdown('<div class="alert-urgent"><strong>🚨 URGENT - Next 3 Days!</strong></div>', unsafe_allow_html=True)
         
-        for task in urgent:
-            task_id, title, desc, category, task_type, due_date, priority, status, created = task
-            st.markdown(f"""
-            <div class="task-card urgent-task">
-                <p class="task-title">⚠️ {title}</p>
-                <p class="task-meta">📅 Due: {due_date} | 🎯 {priority}</p>
-            </div>
-            """, unsafe_allow_html=True)
+        st.markdown(task_cards(urgent, "urgent-task", "⚠️ ", layout="urgent"), unsafe_allow_html=True)
+    
+    st.divider()
+    
+    st.markdown("<h2 class='section-header section-header-purple'>🎯 Study Next</h2>", unsafe_allow_html=True)
+    st.markdown(plan_cards(study_plan(STUDY_PLAN_SIZE)), unsafe_allow_html=True)
     
     st.divider()
     
@@ -554,40 +592,16 @@ if page == "📊 Dashboard":
     with col1:
         st.markdown("<h3 class='section-header section-header-green'>💼 Work Tasks</h3>", unsafe_allow_html=True)
         if work_tasks:
-            for task in work_tasks[:5]:
-                task_id, title, desc, category, task_type, due_date, priority, status, created = task
-                col_t, col_b = st.columns([4, 1])
-                with col_t:
-                    st.markdown(f"""
-                    <div class="task-card work-task">
-                        <p class="task-title">✅ {title}</p>
-                        <p class="task-meta">📅 {due_date}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col_b:
-                    if st.button("Done", key=f"w{task_id}", help="Mark complete"):
-                        complete_task(task_id)
-                        st.rerun()
+            st.markdown(task_cards(work_tasks, "work-task", "✅ "), unsafe_allow_html=True)
+            completion_form("dash_work", work_tasks)
         else:
             st.markdown("<div class='alert-success'><strong>✅ All work tasks done!</strong></div>", unsafe_allow_html=True)
     
     with col2:
         st.markdown("<h3 class='section-header section-header-purple'>📚 Bar Prep Tasks</h3>", unsafe_allow_html=True)
         if bar_tasks:
-            for task in bar_tasks[:5]:
-                task_id, title, desc, category, task_type, due_date, priority, status, created = task
-                col_t, col_b = st.columns([4, 1])
-                with col_t:
-                    st.markdown(f"""
-                    <div class="task-card bar-task">
-                        <p class="task-title">📚 {title}</p>
-                        <p class="task-meta">📅 {due_date}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col_b:
-                    if st.button("Done", key=f"b{task_id}", help="Mark complete"):
-                        complete_task(task_id)
-                        st.rerun()
+            st.markdown(task_cards(bar_tasks, "bar-task", "📚 "), unsafe_allow_html=True)
+            completion_form("dash_bar", bar_tasks)
         else:
             st.markdown("<div class='alert-success'><strong>✅ All Bar prep tasks done!</strong></div>", unsafe_allow_html=True)
 
@@ -604,13 +618,9 @@ elif page == "💼 Work Tasks":
         
         col1, col2 = st.columns(2)
         with col1:
-            task_type = st.selectbox("Work Type", [
-                "Work - Content Creation",
-                "Work - Class Management",
-                "Work - Team Reporting"
-            ])
+            task_type = st.selectbox("Work Type", WORK_TASK_TYPES)
         with col2:
-            priority = st.selectbox("Priority", ["Low", "Medium", "High", "Urgent"])
+            priority = st.selectbox("Priority", PRIORITIES)
         
         due = st.date_input("Due Date")
         
@@ -625,25 +635,13 @@ elif page == "💼 Work Tasks":
     
     st.markdown("<h3 class='section-header section-header-green'>📋 Your Work Tasks</h3>", unsafe_allow_html=True)
     
-    work_tasks = get_tasks_by_type("work")
+    work_page = task_page("work", "work_list")
+    work_tasks = work_page["rows"]
     
     if work_tasks:
-        for task in work_tasks:
-            task_id, title, desc, category, task_type, due_date, priority, status, created = task
-            
-            col1, col2 = st.columns([4, 1])
-            with col1:
-                st.markdown(f"""
-                <div class="task-card work-task">
-                    <p class="task-title">{title}</p>
-                    <p class="task-meta">{desc if desc else 'No description'}</p>
-                    <p class="task-meta">📅 {due_date} | 🎯 {priority}</p>
-                </div>
-                """, unsafe_allow_html=True)
-            with col2:
-                if st.button("✓", key=f"comp_w{task_id}"):
-                    complete_task(task_id)
-                    st.rerun()
+        st.markdown(task_cards(work_tasks, "work-task", layout="detailed"), unsafe_allow_html=True)
+        completion_form("work_list", work_tasks)
+        task_page_nav(work_page, "work_list")
     else:
         st.markdown("<div class='alert-success'><strong>✅ No pending work tasks!</strong></div>", unsafe_allow_html=True)
 
@@ -663,13 +661,9 @@ elif page == "📚 Bar Prep":
             
             col1, col2 = st.columns(2)
             with col1:
-                task_type = st.selectbox("Bar Task Type", [
-                    "Bar Prep - Essay",
-                    "Bar Prep - MBE",
-                    "Bar Prep - Performance Test"
-                ])
+                task_type = st.selectbox("Bar Task Type", BAR_TASK_TYPES)
             with col2:
-                priority = st.selectbox("Priority", ["Low", "Medium", "High", "Urgent"])
+                priority = st.selectbox("Priority", PRIORITIES)
             
             due = st.date_input("Due Date")
             
@@ -684,43 +678,24 @@ elif page == "📚 Bar Prep":
         
         st.markdown("<h3 class='section-header section-header-purple'>📋 Bar Prep Tasks</h3>", unsafe_allow_html=True)
         
-        bar_tasks = get_tasks_by_type("bar")
+        bar_page = task_page("bar", "bar_list")
+        bar_tasks = bar_page["rows"]
         
         if bar_tasks:
-            for task in bar_tasks:
-                task_id, title, desc, category, task_type, due_date, priority, status, created = task
-                
-                col1, col2 = st.columns([4, 1])
-                with col1:
-                    st.markdown(f"""
-                    <div class="task-card bar-task">
-                        <p class="task-title">{title}</p>
-                        <p class="task-meta">{desc if desc else 'No description'}</p>
-                        <p class="task-meta">📅 {due_date} | 🎯 {priority}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                with col2:
-                    if st.button("✓", key=f"comp_b{task_id}"):
-                        complete_task(task_id)
-                        st.rerun()
+            st.markdown(task_cards(bar_tasks, "bar-task", layout="detailed"), unsafe_allow_html=True)
+            completion_form("bar_list", bar_tasks)
+            task_page_nav(bar_page, "bar_list")
         else:
             st.markdown("<div class='alert-success'><strong>✅ No pending Bar prep tasks!</strong></div>", unsafe_allow_html=True)
     
     with tab2:
         st.markdown("<p style='color: #e0e7ff; font-weight: 700; font-size: 1.1rem;'>📚 Log Study Session</p>", unsafe_allow_html=True)
         
-        bar_subjects = [
-            "Civil Procedure", "Constitutional Law", "Contracts", 
-            "Criminal Law", "Criminal Procedure", "Torts", 
-            "Property", "Evidence", "Business Organizations",
-            "Community Property", "Wills & Trusts", "Remedies"
-        ]
-        
         with st.form("study_form"):
             col1, col2 = st.columns(2)
             
             with col1:
-                subject = st.selectbox("📚 Subject", bar_subjects)
+                subject = st.selectbox("📚 Subject", BAR_SUBJECTS)
                 hours = st.number_input("⏱️ Hours", min_value=0.5, max_value=8.0, step=0.5, value=1.5)
             
             with col2:
@@ -738,15 +713,7 @@ elif page == "📚 Bar Prep":
         
         progress = get_study_progress()
         if progress:
-            for p in progress[:10]:
-                prog_id, subject, date, hours, clarity, notes = p
-                clarity_emoji = "🔴" if clarity <= 2 else "🟡" if clarity == 3 else "🟢"
-                st.markdown(f"""
-                <div class="task-card">
-                    <p class="task-title">{clarity_emoji} {subject}</p>
-                    <p class="task-meta">{hours}h | Clarity: {clarity}/5 | {date[:10]}</p>
-                </div>
-                """, unsafe_allow_html=True)
+            st.markdown(session_cards(progress[:10]), unsafe_allow_html=True)
         else:
             st.markdown("<div class='alert-success'><strong>No sessions yet.</strong></div>", unsafe_allow_html=True)
     
@@ -757,11 +724,7 @@ elif page == "📚 Bar Prep":
             col1, col2 = st.columns(2)
             
             with col1:
-                exam_type = st.selectbox("📋 Test Type", [
-                    "Essay (Single)", "Essay (Multiple)",
-                    "Performance Test", "MBE Section",
-                    "Full MBE (200q)", "Full Practice Exam"
-                ])
+                exam_type = st.selectbox("📋 Test Type", MOCK_EXAM_TYPES)
                 score = st.number_input("📊 Score", min_value=0, step=1, value=0)
             
             with col2:
@@ -771,7 +734,7 @@ elif page == "📚 Bar Prep":
             notes = st.text_area("💭 Notes", height=80)
             
             if st.form_submit_button("🎯 Log Score"):
-                log_mock(exam_type, score, total, notes)
+                log_mock(exam_type, score, total, notes, subjects)
                 percentage = (score / total * 100) if total > 0 else 0
                 st.success(f"✅ Logged: {percentage:.1f}%")
         
@@ -779,23 +742,10 @@ elif page == "📚 Bar Prep":
         
         st.markdown("<h3 class='section-header section-header-purple'>🎯 Score History</h3>", unsafe_allow_html=True)
         
-        conn = init_db()
-        c = conn.cursor()
-        c.execute('SELECT * FROM mock_scores ORDER BY date DESC LIMIT 10')
-        mocks = c.fetchall()
-        conn.close()
+        mocks = get_mock_scores(10)
         
         if mocks:
-            for m in mocks:
-                mock_id, exam_type, score, total, date, notes = m
-                percentage = (score / total * 100) if total > 0 else 0
-                pct_emoji = "🔴" if percentage < 60 else "🟡" if percentage < 75 else "🟢"
-                st.markdown(f"""
-                <div class="task-card">
-                    <p class="task-title">{pct_emoji} {exam_type}</p>
-                    <p class="task-meta">{score}/{total} ({percentage:.1f}%) | {date[:10]}</p>
-                </div>
-                """, unsafe_allow_html=True)
+            st.markdown(mock_cards(mocks), unsafe_allow_html=True)
         else:
             st.markdown("<div class='alert-success'><strong>No scores yet.</strong></div>", unsafe_allow_html=True)
 
@@ -804,24 +754,34 @@ elif page == "📚 Bar Prep":
 elif page == "📈 Analytics":
     st.markdown("<h2 class='section-header'>📈 Your Progress & Analytics</h2>", unsafe_allow_html=True)
     
-    progress = get_study_progress()
+    trends = get_trends()
+    study = trends["study"]
+    mock_trend = trends["mocks"]
     weak = get_weak_subjects()
     
-    col1, col2, col3 = st.columns(3, gap="large")
+    summary = analytics_summary(*analytics_range())
     
-    if progress:
-        total_hours = sum([p[2] for p in progress])
-        with col1:
-            st.metric("⏰ Study Hours", f"{total_hours:.1f}h")
+    col1, col2, col3, col4, col5 = st.columns(5, gap="large")
     
-    if weak:
-        avg_clarity = sum([w[1] for w in weak]) / len(weak)
-        with col2:
-            st.metric("📊 Avg Clarity", f"{avg_clarity:.1f}/5")
+    with col1:
+        st.metric("⏰ Study Hours", f"{summary['total_hours']:.1f}h")
+    
+    with col2:
+        st.metric("📖 Sessions", summary["sessions"])
     
-    completed = len([t for t in get_all_tasks() if t[7] == "completed"])
     with col3:
-        st.metric("✅ Completed", completed)
+        if summary["avg_clarity"] is not None:
+            st.metric("📊 Avg Clarity", f"{summary['avg_clarity']:.1f}/5")
+    
+    with col4:
+        if summary["mock_average"] is not None:
+            st.metric("🎯 Mock Avg", f"{summary['mock_average']:.1f}%", help=f"over {summary['mock_count']} mocks")
+    
+    with col5:
+        st.metric("✅ Completed", summary["completed_total"])
+        if summary["completed"]:
+            st.caption(" · ".join(f"{category or 'Other'}: {count}"
+                                  for category, count in summary["completed"].items()))
     
     st.divider()
     
@@ -847,39 +807,118 @@ elif page == "📈 Analytics":
     
     st.markdown("<h3 class='section-header'>📚 Study Hours by Subject</h3>", unsafe_allow_html=True)
     
-    if progress:
-        study_by_subject = {}
-        for p in progress:
-            subject = p[1]
-            hours = p[2]
-            if subject not in study_by_subject:
-                study_by_subject[subject] = 0
-            study_by_subject[subject] += hours
-        
-        st.bar_chart({s: h for s, h in study_by_subject.items()})
+    subject_hours = get_subject_hours()
+    if subject_hours:
+        st.bar_chart({s: h for s, h in subject_hours})
     else:
         st.markdown("<div class='alert-success'><strong>No data yet!</strong></div>", unsafe_allow_html=True)
+    
+    if study:
+        st.markdown("<h3 class='section-header'>📅 Weekly Study Hours</h3>", unsafe_allow_html=True)
+        weekly = study["weekly"]
+        st.bar_chart({"Week": weekly["week"][-TREND_WEEKS:], "Hours": weekly["hours"][-TREND_WEEKS:]},
+                     x="Week", y="Hours")
+        
+        st.markdown(f"<h3 class='section-header'>🧠 Clarity Trend ({CLARITY_WINDOW_DAYS}-day rolling average)</h3>", unsafe_allow_html=True)
+        clarity = study["clarity"]
+        st.line_chart({"Day": clarity["day"][-TREND_DAYS:],
+                       **{subject: series[-TREND_DAYS:] for subject, series in clarity["by_subject"].items()}},
+                      x="Day")
+    
+    st.divider()
+    
+    st.markdown("<h3 class='section-header'>🎯 Mock Score Trend</h3>", unsafe_allow_html=True)
+    
+    if mock_trend:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Latest Mock", f"{mock_trend['latest']:.1f}%")
+        with col2:
+            if mock_trend["slope_per_week"] is not None:
+                st.metric("Trend", f"{mock_trend['slope_per_week']:+.2f} pts/week",
+                          delta=f"{mock_trend['slope_per_week']:+.2f}")
+        series = {"Date": mock_trend["day"][-TREND_MOCKS:],
+                  "Score %": mock_trend["percentage"][-TREND_MOCKS:],
+                  f"{MOCK_WINDOW}-mock average": mock_trend["moving_average"][-TREND_MOCKS:]}
+        if mock_trend["trend"] is not None:
+            series["Trend"] = mock_trend["trend"][-TREND_MOCKS:]
+        st.line_chart(series, x="Date")
+        st.caption(" · ".join(f"{exam_type}: {mean:.1f}% over {count}"
+                              for exam_type, (count, mean) in mock_trend["by_type"].items()))
+    else:
+        st.markdown("<div class='alert-success'><strong>Log a mock score to see your trend!</strong></div>", unsafe_allow_html=True)
+    
+    subject_mocks = get_mock_subject_stats()
+    if subject_mocks:
+        st.markdown("<h3 class='section-header'>🏷️ Mock Scores by Subject</h3>", unsafe_allow_html=True)
+        st.bar_chart({subject: average for subject, count, average in subject_mocks})
+        st.caption(" · ".join(f"{subject}: {average:.1f}% over {count}" for subject, count, average in subject_mocks))
+
+# ==================== SEARCH ====================
+
+elif page == "🔍 Search":
+    st.markdown("<h2 class='section-header'>🔍 Search</h2>", unsafe_allow_html=True)
+    
+    query = st.text_input("Search tasks, study notes and mock notes", placeholder="e.g., hearsay",
+                          key="search_query", on_change=reset_search_page)
+    
+    if query:
+        results = search(query, SEARCH_PAGE_SIZE, st.session_state.get("search_offset", 0))
+        if results["rows"]:
+            st.markdown(search_cards(results["rows"]), unsafe_allow_html=True)
+            col_prev, col_next = st.columns(2)
+            with col_prev:
+                if st.button("← Previous", key="search_prev", disabled=not results["has_prev"]):
+                    st.session_state["search_offset"] = max(0, results["offset"] - SEARCH_PAGE_SIZE)
+                    st.rerun()
+            with col_next:
+                if st.button("Next →", key="search_next", disabled=not results["has_next"]):
+                    st.session_state["search_offset"] = results["offset"] + SEARCH_PAGE_SIZE
+                    st.rerun()
+            if results["capped"]:
+                st.caption(f"Showing the best of the newest {SEARCH_CANDIDATES} matches; "
+                           "add words to the search to reach older ones.")
+        else:
+            st.markdown("<div class='alert-success'><strong>No matches.</strong></div>", unsafe_allow_html=True)
+
+# ==================== ARCHIVE ====================
+
+elif page == "🗄️ Archive":
+    st.markdown("<h2 class='section-header'>🗄️ Completed Task Archive</h2>", unsafe_allow_html=True)
+    st.caption(f"Tasks move here {pa_archive.ARCHIVE_AFTER_DAYS:g} days after they are completed. "
+               f"{get_completed_count()} tasks completed in total.")
+    
+    archived = archive_page()
+    if archived["rows"]:
+        st.markdown(archive_cards(archived["rows"]), unsafe_allow_html=True)
+    else:
+        st.markdown("<div class='alert-success'><strong>Nothing archived yet.</strong></div>", unsafe_allow_html=True)
 
 # ==================== SIDEBAR ====================
 
+perf.mark("sidebar")
+
 st.sidebar.divider()
 st.sidebar.markdown("<h3 style='color: #e0e7ff; font-weight: 900; text-align: center;'>📊 QUICK STATS</h3>", unsafe_allow_html=True)
 
-all_tasks = get_all_tasks()
-urgent = get_urgent_tasks()
-progress = get_study_progress()
-weak = get_weak_subjects()
+if snapshot is None:
+    snapshot = get_dashboard_snapshot()
 
 col1, col2 = st.sidebar.columns(2)
 with col1:
-    st.metric("Pending", len(all_tasks), label_visibility="collapsed")
+    st.metric("Pending", snapshot["pending_count"], label_visibility="collapsed")
 with col2:
-    st.metric("Urgent", len(urgent), label_visibility="collapsed")
+    st.metric("Urgent", len(pa_urgent.urgent_tasks()), label_visibility="collapsed")
 
-st.sidebar.metric("Sessions", len(progress), label_visibility="collapsed")
+st.sidebar.metric("Sessions", snapshot["session_count"], label_visibility="collapsed")
 
-if weak:
-    st.sidebar.markdown(f"<p style='color: #cbd5e1; font-size: 0.95rem; text-align: center;'><strong>Weakest:</strong><br>{weak[0][0]}</p>", unsafe_allow_html=True)
+if snapshot["weakest_subject"]:
+    st.sidebar.markdown(f"<p style='color: #cbd5e1; font-size: 0.95rem; text-align: center;'><strong>Weakest:</strong><br>{snapshot['weakest_subject']}</p>", unsafe_allow_html=True)
+
+st.sidebar.button("↩️ Undo last action", key="undo_last", on_click=undo_last, args=(current_path(),),
+                  use_container_width=True)
+if "undo_message" in st.session_state:
+    st.sidebar.caption(st.session_state.pop("undo_message"))
 
 st.sidebar.divider()
 st.sidebar.markdown("""
@@ -889,3 +928,8 @@ Your personal AI assistant<br>
 Data stored locally & secure
 </p>
 """, unsafe_allow_html=True)
+
+backups = pa_backup.snapshots(current_path())
+st.sidebar.caption(f"💾 Last backup: {backups[0][0]:%b %d, %H:%M}" if backups else "💾 No backup yet")
+
+pa_perf.render_panel(perf.finish(page))
@@ -0,0 +1,168 @@
+"""Archival of completed tasks and scheduled database maintenance.
+
+Completing a task only flips its status, so without this every pending-task
+query would have to step over a growing tail of finished work. Tasks that
+have been completed for ARCHIVE_AFTER_DAYS move to ``tasks_archive`` in
+batches of ARCHIVE_BATCH, one short write transaction each so the app's own
+writes interleave; they stay in Search, and new tasks take ids past the
+archive's (pa_db.NEXT_ID) so ids are never reused. After archiving, the freed pages are
+returned with ``PRAGMA incremental_vacuum`` and planner statistics
+refreshed with ``PRAGMA optimize``.
+
+A daemon thread runs this for every database the app has used (one per
+user in multi-user mode) once every MAINTENANCE_HOURS, checking hourly;
+the last run of each database is kept in its ``maintenance_log``. Run it
+by hand with::
+
+    python pa_archive.py [--db ai_pa.db] [--user NAME] [--days 30]
+
+Databases created before incremental auto-vacuum need one full VACUUM to
+switch over; stop the app and run ``python pa_archive.py --vacuum``.
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import pa_db
+
+ARCHIVE_AFTER_DAYS = float(os.environ.get("AI_PA_ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH = int(os.environ.get("AI_PA_ARCHIVE_BATCH", "500"))
+MAINTENANCE_HOURS = float(os.environ.get("AI_PA_MAINTENANCE_HOURS", "24"))
+CHECK_SECONDS = 3600
+
+logger = logging.getLogger("ai_pa.archive")
+
+
+def archive_completed(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH):
+    """Archive every task completed more than ``older_than_days`` ago;
+    returns how many moved."""
+    cutoff = pa_db.epoch_seconds(datetime.now()) - int(older_than_days * 86400)
+    moved = 0
+    while True:
+        batch = pa_db.archive_tasks(cutoff, batch_size)
+        moved += batch
+        if batch < batch_size:
+            return moved
+
+
+def maintain(older_than_days=ARCHIVE_AFTER_DAYS):
+    """Archive, vacuum and optimize the current database; returns
+    (tasks archived, pages freed)."""
+    started = time.perf_counter()
+    archived = archive_completed(older_than_days)
+    freed = pa_db.run_maintenance(pa_db.epoch_seconds(datetime.now()), archived, started)
+    logger.info("maintenance of %s: archived %d tasks, freed %d pages in %.2fs",
+                pa_db.current_path(), archived, freed, time.perf_counter() - started)
+    return archived, freed
+
+
+def vacuum(path=None):
+    """Rewrite the database with a full VACUUM, switching it to incremental
+    auto-vacuum; nothing else may have it open. Returns the pages freed."""
+    path = path or pa_db.current_path()
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        before = conn.execute("PRAGMA page_count").fetchone()[0]
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return before - conn.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def is_due(interval_hours=MAINTENANCE_HOURS):
+    last = pa_db.get_last_maintenance()
+    return last is None or pa_db.epoch_seconds(datetime.now()) - last >= interval_hours * 3600
+
+# ==================== SCHEDULER ====================
+
+class Maintenance(threading.Thread):
+    """Runs maintain() on each watched database when it is due."""
+
+    def __init__(self, check_seconds=CHECK_SECONDS):
+        super().__init__(name="ai-pa-maintenance", daemon=True)
+        self.check_seconds = check_seconds
+        self._watched = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def watch(self, path):
+        """Maintain ``path`` from now on (least recently watched dropped
+        beyond pa_db.MAX_OPEN_SHARDS)."""
+        with self._lock:
+            new = path not in self._watched
+            self._watched[path] = True
+            self._watched.move_to_end(path)
+            while len(self._watched) > pa_db.MAX_OPEN_SHARDS:
+                self._watched.popitem(last=False)
+        if new:
+            self._wake.set()
+
+    def run(self):
+        while not self._stopping:
+            self._wake.clear()
+            with self._lock:
+                paths = list(self._watched)
+            for path in paths:
+                try:
+                    with pa_db.scoped(path):
+                        if is_due():
+                            maintain()
+                except Exception:
+                    logger.exception("maintenance failed for %s", path)
+            self._wake.wait(self.check_seconds)
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+
+_maintenance = None
+_maintenance_lock = threading.Lock()
+
+
+def start():
+    """Start the process-wide maintenance thread and have it look after the
+    current database; later calls only add databases."""
+    global _maintenance
+    if _maintenance is None:
+        with _maintenance_lock:
+            if _maintenance is None:
+                maintenance = Maintenance()
+                maintenance.start()
+                _maintenance = maintenance
+    _maintenance.watch(pa_db.current_path())
+    return _maintenance
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive completed tasks and compact the database.")
+    parser.add_argument("--db", help="database file (default: ai_pa.db or $AI_PA_DB)")
+    parser.add_argument("--user", help="multi-user mode: maintain this user's shard instead")
+    parser.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help="archive tasks completed more than this many days ago")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="then run a full VACUUM (app stopped) to switch to incremental auto-vacuum")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.db:
+        pa_db.configure(args.db)
+    if args.user:
+        pa_db.use_user(args.user)
+    pa_db.init_db()
+    maintain(args.days)
+    pa_db.get_pool().close()
+    if args.vacuum:
+        logger.info("vacuumed %s: freed %d pages", pa_db.current_path(), vacuum())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Online backups of the app's databases.
+
+``ai_pa.db`` (or a user's shard) is the only copy of their history, and
+copying the file while the app writes to it can capture a torn state. A
+daemon thread instead copies each database the app has used with SQLite's
+backup API, BACKUP_PAGES pages per step and a short pause between steps,
+so the app's readers and its writer keep running. If writes keep
+restarting the copy, it finishes in a single step instead: in WAL mode
+that only holds a read snapshot, which doesn't block the writer either.
+
+Each snapshot is written to a ``backups`` directory next to the database
+(or BACKUP_DIR; a relative one is taken from the database's directory) as
+``<name>-YYYYmmdd-HHMMSS.db`` (journal mode DELETE, so it is one
+self-contained file) and must pass ``PRAGMA integrity_check`` before it
+replaces the partial file. Partial files a killed process left behind are
+deleted before the next backup and when pruning. The newest
+BACKUP_KEEP snapshots of each database are kept, minus any older than
+BACKUP_MAX_DAYS; the newest is never pruned. A database is backed up once
+every BACKUP_HOURS (0 turns the scheduler off). Restore by stopping the
+app and copying a snapshot over the database file. Run one by hand with::
+
+    python pa_backup.py [--db ai_pa.db] [--user NAME] [--dir DIR]
+
+Tools and tests that run the app script set ``AI_PA_BACKUP_HOURS=0``.
+"""
+
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import pa_db
+
+BACKUP_DIR = os.environ.get("AI_PA_BACKUP_DIR", "backups")
+BACKUP_HOURS = float(os.environ.get("AI_PA_BACKUP_HOURS", "24"))
+BACKUP_KEEP = int(os.environ.get("AI_PA_BACKUP_KEEP", "7"))
+BACKUP_MAX_DAYS = float(os.environ.get("AI_PA_BACKUP_MAX_DAYS", "30"))
+BACKUP_PAGES = int(os.environ.get("AI_PA_BACKUP_PAGES", "256"))
+# Pause between steps, and how many restarts (a write landed mid-copy) to
+# sit through before copying in one step.
+STEP_PAUSE = 0.005
+MAX_RESTARTS = 3
+CHECK_SECONDS = 3600
+# A partial file nobody has written to for this long is left over from a
+# process that died mid-copy.
+STALE_PARTIAL_SECONDS = 600
+
+STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+logger = logging.getLogger("ai_pa.backup")
+
+
+class _Restarted(Exception):
+    pass
+
+
+def snapshot_name(path, when):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{when.strftime(STAMP_FORMAT)}.db"
+
+
+def backup_dir(path):
+    """Where snapshots of ``path`` go: BACKUP_DIR, relative to the database."""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), BACKUP_DIR)
+
+
+def _files(path, directory, suffix):
+    stem = re.escape(os.path.splitext(os.path.basename(path))[0])
+    pattern = re.compile(rf"^{stem}-(\d{{8}}-\d{{6}})\.db{suffix}$")
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            found.append((match.group(1), os.path.join(directory, name)))
+    return found
+
+
+def snapshots(path, directory=None):
+    """(taken at, file) of every snapshot of ``path``, newest first."""
+    found = _files(path, directory or backup_dir(path), "")
+    return sorted(((datetime.strptime(stamp, STAMP_FORMAT), name) for stamp, name in found), reverse=True)
+
+
+def remove_partials(path, directory=None, stale_seconds=STALE_PARTIAL_SECONDS):
+    """Delete partial snapshots of ``path`` (and their journals) untouched
+    for ``stale_seconds``; returns the files removed."""
+    removed = []
+    for _, name in _files(path, directory or backup_dir(path), r"\.partial(-journal)?"):
+        try:
+            if time.time() - os.path.getmtime(name) >= stale_seconds:
+                os.remove(name)
+                removed.append(name)
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _copy(source, dest, pages):
+    last = [None, 0]
+
+    def progress(status, remaining, total):
+        # Remaining only goes up when a write restarted the copy.
+        if last[0] is not None and remaining > last[0]:
+            last[1] += 1
+            if last[1] > MAX_RESTARTS:
+                raise _Restarted()
+        last[0] = remaining
+        time.sleep(STEP_PAUSE)
+
+    source.backup(dest, pages=pages, progress=progress)
+
+
+def backup(path=None, directory=None):
+    """Snapshot ``path`` (default: the current database) into
+    ``directory`` (default: backup_dir) and verify it; returns the
+    snapshot's file."""
+    path = path or pa_db.current_path()
+    directory = directory or backup_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    remove_partials(path, directory)
+    final = os.path.join(directory, snapshot_name(path, datetime.now()))
+    partial = final + ".partial"
+    started = time.perf_counter()
+    source = sqlite3.connect(path, timeout=5.0)
+    dest = sqlite3.connect(partial)
+    try:
+        try:
+            _copy(source, dest, BACKUP_PAGES)
+        except _Restarted:
+            logger.info("backup of %s kept restarting; copying in one step", path)
+            _copy(source, dest, -1)
+        dest.execute("PRAGMA journal_mode = DELETE")
+        result = dest.execute("PRAGMA integrity_check").fetchall()
+        if result != [("ok",)]:
+            raise sqlite3.DatabaseError(f"snapshot of {path} failed integrity_check: {result[:5]}")
+    except BaseException:
+        dest.close()
+        os.remove(partial)
+        raise
+    finally:
+        source.close()
+    dest.close()
+    os.replace(partial, final)
+    logger.info("backed up %s to %s in %.2fs", path, final, time.perf_counter() - started)
+    return final
+
+
+def prune(path=None, directory=None, keep=BACKUP_KEEP, max_days=BACKUP_MAX_DAYS):
+    """Delete snapshots of ``path`` beyond the newest ``keep`` or older
+    than ``max_days``, always keeping the newest, and stale partial files;
+    returns the files removed."""
+    path = path or pa_db.current_path()
+    now = datetime.now()
+    removed = remove_partials(path, directory)
+    for index, (taken, name) in enumerate(snapshots(path, directory)):
+        if index and (index >= keep or (now - taken).total_seconds() > max_days * 86400):
+            os.remove(name)
+            removed.append(name)
+    return removed
+
+
+def is_due(path, directory=None, interval_hours=BACKUP_HOURS):
+    found = snapshots(path, directory)
+    return not found or (datetime.now() - found[0][0]).total_seconds() >= interval_hours * 3600
+
+# ==================== SCHEDULER ====================
+
+class Backups(threading.Thread):
+    """Backs up and prunes each watched database when it is due."""
+
+    def __init__(self, directory=None, check_seconds=CHECK_SECONDS):
+        super().__init__(name="ai-pa-backups", daemon=True)
+        self.directory = directory
+        self.check_seconds = check_seconds
+        self._watched = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def watch(self, path):
+        """Back up ``path`` from now on (least recently watched dropped
+        beyond pa_db.MAX_OPEN_SHARDS)."""
+        with self._lock:
+            new = path not in self._watched
+            self._watched[path] = True
+            self._watched.move_to_end(path)
+            while len(self._watched) > pa_db.MAX_OPEN_SHARDS:
+                self._watched.popitem(last=False)
+        if new:
+            self._wake.set()
+
+    def run(self):
+        while not self._stopping:
+            self._wake.clear()
+            with self._lock:
+                paths = list(self._watched)
+            for path in paths:
+                try:
+                    if os.path.exists(path) and is_due(path, self.directory):
+                        backup(path, self.directory)
+                        prune(path, self.directory)
+                except Exception:
+                    logger.exception("backup failed for %s", path)
+            self._wake.wait(self.check_seconds)
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+
+_backups = None
+_backups_lock = threading.Lock()
+
+
+def start():
+    """Start the process-wide backup thread (unless BACKUP_HOURS is 0) and
+    have it look after the current database; later calls only add databases."""
+    global _backups
+    if BACKUP_HOURS <= 0:
+        return None
+    if _backups is None:
+        with _backups_lock:
+            if _backups is None:
+                backups = Backups()
+                backups.start()
+                _backups = backups
+    _backups.watch(pa_db.current_path())
+    return _backups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Take a verified online backup of the database.")
+    parser.add_argument("--db", help="database file (default: ai_pa.db or $AI_PA_DB)")
+    parser.add_argument("--user", help="multi-user mode: back up this user's shard instead")
+    parser.add_argument("--dir", help="where snapshots go (default: backups/ next to the database)")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help="snapshots to keep")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.db:
+        pa_db.configure(args.db)
+    if args.user:
+        pa_db.use_user(args.user)
+    pa_db.init_db()
+    print(backup(directory=args.dir))
+    for name in prune(directory=args.dir, keep=args.keep):
+        print(f"removed {name}")
+    pa_db.get_pool().close()
+
+
+if __name__ == "__main__":
+    main()
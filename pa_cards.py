@@ -0,0 +1,155 @@
+"""Batched HTML for the task, session and mock-score card lists.
+
+Each list renders to one HTML string, so the app sends it as a single
+``st.markdown`` element instead of one element (plus a column pair) per
+row. Everything interpolated is HTML-escaped, and rendered lists are
+memoised on their rows, which the read cache keeps identical until the
+next write.
+"""
+
+from datetime import datetime, timedelta
+from functools import lru_cache
+from html import escape
+
+from pa_db import HIGHLIGHT
+
+CACHE_SIZE = 64
+
+_CARD = '<div class="task-card{variant}"><p class="task-title">{title}</p>{meta}</div>'
+_META = '<p class="task-meta">{}</p>'
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _e(value):
+    # Newlines would end Streamlit's markdown HTML block, so keep them inline.
+    return escape("" if value is None else str(value)).replace("\n", "<br>")
+
+
+def _card(variant, title, *meta):
+    return _CARD.format(
+        variant=f" {variant}" if variant else "",
+        title=title,
+        meta="".join(_META.format(line) for line in meta),
+    )
+
+
+def _marked(value):
+    # Escape first, then turn the search highlight markers into real tags.
+    return _e(value).replace(HIGHLIGHT[0], "<mark>").replace(HIGHLIGHT[1], "</mark>")
+
+
+def clarity_emoji(clarity):
+    return "🔴" if clarity <= 2 else "🟡" if clarity == 3 else "🟢"
+
+
+def percentage_emoji(percentage):
+    return "🔴" if percentage < 60 else "🟡" if percentage < 75 else "🟢"
+
+# ==================== LISTS ====================
+
+def task_cards(tasks, variant, icon="", layout="brief"):
+    """Cards for task rows.
+
+    ``layout`` is "brief" (due date only, Dashboard columns), "urgent"
+    (due date and priority) or "detailed" (adds the description).
+    """
+    return _task_cards(tuple(tasks), variant, icon, layout)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _task_cards(tasks, variant, icon, layout):
+    cards = []
+    for task_id, title, desc, category, task_type, due_date, priority, status, created in tasks:
+        title_html = f"{icon}{_e(title)}"
+        if layout == "brief":
+            cards.append(_card(variant, title_html, f"📅 {_e(due_date)}"))
+        elif layout == "urgent":
+            cards.append(_card(variant, title_html, f"📅 Due: {_e(due_date)} | 🎯 {_e(priority)}"))
+        else:
+            cards.append(_card(variant, title_html, _e(desc) if desc else "No description",
+                               f"📅 {_e(due_date)} | 🎯 {_e(priority)}"))
+    return "".join(cards)
+
+
+def session_cards(sessions):
+    return _session_cards(tuple(sessions))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _session_cards(sessions):
+    return "".join(
+        _card("", f"{clarity_emoji(clarity)} {_e(subject)}",
+              f"{_e(hours)}h | Clarity: {_e(clarity)}/5 | {_e(date[:10])}")
+        for prog_id, subject, date, hours, clarity, notes in sessions
+    )
+
+
+def mock_cards(mocks):
+    return _mock_cards(tuple(mocks))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _mock_cards(mocks):
+    cards = []
+    for mock_id, exam_type, score, total, date, notes in mocks:
+        percentage = (score / total * 100) if total > 0 else 0
+        cards.append(_card("", f"{percentage_emoji(percentage)} {_e(exam_type)}",
+                           f"{_e(score)}/{_e(total)} ({percentage:.1f}%) | {_e(date[:10])}"))
+    return "".join(cards)
+
+
+def plan_cards(plan):
+    return _plan_cards(tuple(plan))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _plan_cards(plan):
+    cards = []
+    for subject, due_in, clarity, hours, mock_pct in plan:
+        if due_in is None:
+            when = "Not studied yet"
+        elif due_in <= 0:
+            when = f"Overdue by {-due_in:.1f} days"
+        else:
+            when = f"Due in {due_in:.1f} days"
+        details = [when]
+        if clarity is not None:
+            details.append(f"Clarity {clarity:.1f}/5")
+        details.append(f"{hours:.1f}h studied")
+        if mock_pct is not None:
+            details.append(f"Mocks {mock_pct:.0f}%")
+        emoji = "⚪" if clarity is None else clarity_emoji(round(clarity))
+        cards.append(_card("bar-task", f"{emoji} {_e(subject)}", _e(" | ".join(details))))
+    return "".join(cards)
+
+
+SEARCH_ICONS = {"task": "📋", "study": "📖", "mock": "🎯"}
+
+
+def search_cards(results):
+    return _search_cards(tuple(results))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _search_cards(results):
+    cards = []
+    for kind, row_id, day, title, snippet in results:
+        meta = [_marked(snippet)] if snippet else []
+        meta.append(f"{_e(kind.title())} | 📅 {_e((day or '')[:10])}")
+        cards.append(_card("", f"{SEARCH_ICONS.get(kind, '')} {_marked(title)}", *meta))
+    return "".join(cards)
+
+
+def archive_cards(tasks):
+    """Cards for get_archive_page rows (task rows plus completed_ts)."""
+    return _archive_cards(tuple(tasks))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _archive_cards(tasks):
+    cards = []
+    for task_id, title, desc, category, task_type, due_date, priority, status, created, completed_ts in tasks:
+        completed = (_EPOCH + timedelta(seconds=completed_ts)).date()
+        cards.append(_card("work-task" if category == "Work" else "bar-task", f"✓ {_e(title)}",
+                           f"Completed {completed} | 📅 Due {_e(due_date)} | {_e(task_type)}"))
+    return "".join(cards)
@@ -0,0 +1,270 @@
+"""Optional DuckDB mirror of the history tables for the Analytics page.
+
+SQLite stays the source of truth. When enabled (``AI_PA_ANALYTICS=duckdb``,
+needs ``pip install duckdb pyarrow``) each database gets a columnar copy next to it
+(``ai_pa.db.duckdb``) and pa_trends loads the study and mock history from
+it as ready-made columns instead of building arrays from SQLite rows.
+Weak subjects and hours per subject stay on SQLite: they read the
+trigger-maintained subject_stats rows, which no scan can beat.
+
+The mirror syncs lazily before a read, only when pa_db's cache generation
+has moved. Its first sync copies every table in id order and notes the
+journal seq the copy started from (in ``sync_state``); after that it is a
+pa_journal consumer named ``columnar``: each sync reads only the events past
+its offset, deletes the rows they name (ids, an import's id range, the ids
+an undo reverted) and copies those rows back from SQLite if they still
+exist. Nothing is counted or rescanned. Writes that bypass the journal --
+gen_synthetic, hand edits -- aren't seen; call ``rebuild()`` after them.
+
+DuckDB allows one writing process per file, so run a single app process
+per database when the mirror is on.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import pa_db
+from pa_journal import EventConsumer
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ENABLED = os.environ.get("AI_PA_ANALYTICS", "sqlite").lower() == "duckdb"
+# Set by enable(); pa_trends checks it.
+active = False
+CONSUMER = "columnar"
+
+# Columns of pa_db.QUERIES["mirror_<table>"], in order.
+TABLES = {
+    "tasks": (("id", "BIGINT"), ("category", "VARCHAR"), ("task_type", "VARCHAR"),
+              ("priority", "VARCHAR"), ("status", "VARCHAR"), ("due_day", "BIGINT"),
+              ("created_ts", "BIGINT")),
+    "study_progress": (("id", "BIGINT"), ("subject", "VARCHAR"), ("date_ts", "BIGINT"),
+                       ("date_day", "BIGINT"), ("hours_spent", "DOUBLE"), ("clarity_rating", "DOUBLE")),
+    "mock_scores": (("id", "BIGINT"), ("exam_type", "VARCHAR"), ("date_ts", "BIGINT"),
+                    ("date_day", "BIGINT"), ("score", "DOUBLE"), ("total_points", "DOUBLE")),
+}
+ARROW_TYPES = {"BIGINT": "int64", "DOUBLE": "float64", "VARCHAR": "string"}
+
+# The SQLite aggregates' columnar equivalents, for tools/bench_analytics.py.
+QUERIES = {
+    "weak_subjects": """SELECT subject, AVG(COALESCE(clarity_rating, 0)) AS avg_clarity, COUNT(*)
+                 FROM study_progress GROUP BY subject
+                 ORDER BY avg_clarity ASC, subject ASC""",
+    "subject_hours": """SELECT subject, SUM(COALESCE(hours_spent, 0)) FROM study_progress
+                 GROUP BY subject ORDER BY subject ASC""",
+}
+
+# pa_trends histories: (table, label column, value columns). The label is
+# coded as its index in the sorted labels, like pa_trends.load_columns does.
+HISTORIES = {
+    "study": ("study_progress", "subject",
+              "date_day AS day, COALESCE(hours_spent, 0) AS hours, COALESCE(clarity_rating, 0) AS clarity"),
+    "mocks": ("mock_scores", "exam_type",
+              "date_ts AS ts, date_day AS day, COALESCE(score, 0) AS score, "
+              "COALESCE(total_points, 0) AS total"),
+}
+
+
+def mirror_path(path):
+    return path + ".duckdb"
+
+
+def touched(entity, action, payload):
+    """(table, ids) for each mirrored table a journal event changed; ids is
+    None when the event doesn't say which rows, so the table is recopied."""
+    if action == "undo":
+        if "reverted" not in payload:
+            return [(table, None) for table in TABLES]
+        return [(table, ids) for table, ids in payload["reverted"].items() if table in TABLES]
+    if entity not in TABLES:
+        return []
+    if action == "import":
+        return [(entity, range(payload["first_id"], payload["last_id"] + 1))]
+    if "ids" in payload:
+        return [(entity, payload["ids"])]
+    if "id" in payload:
+        return [(entity, [payload["id"]])]
+    return [(entity, None)]
+
+
+class ColumnarMirror:
+    """DuckDB copy of one SQLite database."""
+
+    def __init__(self, path):
+        self.path = path
+        # Cache generation the mirror matches; None until its first sync.
+        self.generation = None
+        self.consumer = EventConsumer(CONSUMER)
+        self.conn = duckdb.connect(mirror_path(path))
+        self._lock = threading.Lock()
+        for table, columns in TABLES.items():
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                              f"({', '.join(f'{name} {kind}' for name, kind in columns)})")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS sync_state
+                             (name VARCHAR PRIMARY KEY, high_water BIGINT NOT NULL)""")
+
+    def built_at(self):
+        """The journal seq the full copy started from; None before one."""
+        row = self.conn.execute("SELECT high_water FROM sync_state WHERE name = 'journal'").fetchone()
+        return row[0] if row else None
+
+    def _insert(self, table, rows):
+        columns = TABLES[table]
+        batch = pa.table({name: pa.array(values, type=ARROW_TYPES[kind])
+                          for (name, kind), values in zip(columns, zip(*rows))})
+        self.conn.register("batch", batch)
+        try:
+            self.conn.execute(f"INSERT INTO {table} SELECT * FROM batch")
+        finally:
+            self.conn.unregister("batch")
+
+    def _transaction(self, fn, *args):
+        self.conn.begin()
+        try:
+            result = fn(*args)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return result
+
+    def _copy(self, table):
+        """Replace ``table`` with a fresh copy; returns the rows copied."""
+        self.conn.execute(f"DELETE FROM {table}")
+        copied, last_id = 0, 0
+        while True:
+            rows = pa_db.get_mirror_rows(table, last_id)
+            if not rows:
+                break
+            self._insert(table, rows)
+            copied, last_id = copied + len(rows), rows[-1][0]
+            if len(rows) < pa_db.MIRROR_BATCH:
+                break
+        return copied
+
+    def _build(self):
+        # Events journaled while copying are replayed by the next sync;
+        # re-applying one is harmless.
+        seq = pa_db.get_last_event()
+        copied = {table: self._copy(table) for table in TABLES}
+        self.conn.execute("DELETE FROM sync_state")
+        self.conn.execute("INSERT INTO sync_state VALUES ('journal', ?)", [seq])
+        return seq, copied
+
+    def rebuild(self):
+        """Copy every table from scratch; returns rows copied per table."""
+        seq, copied = self._transaction(self._build)
+        pa_db.set_consumer_offset(CONSUMER, seq)
+        return copied
+
+    def _apply(self, events):
+        changed, stale = {table: set() for table in TABLES}, set()
+        for _, _, entity, action, payload in events:
+            for table, ids in touched(entity, action, payload):
+                if ids is None:
+                    stale.add(table)
+                else:
+                    changed[table].update(ids)
+        for table in stale:
+            self._copy(table)
+        for table, ids in changed.items():
+            ids = sorted(ids) if table not in stale else []
+            for start in range(0, len(ids), pa_db.MIRROR_BATCH):
+                chunk = ids[start:start + pa_db.MIRROR_BATCH]
+                self.conn.execute(f"DELETE FROM {table} WHERE list_contains(?, id)", [chunk])
+                rows = pa_db.get_mirror_rows_by_id(table, chunk)
+                if rows:
+                    self._insert(table, rows)
+
+    def sync(self):
+        """Bring the mirror up to date with SQLite; free when nothing was
+        written. Returns how many journal events were applied."""
+        # Read the generation first: a write landing mid-sync leaves the
+        # mirror marked stale and the next read catches up.
+        generation = pa_db.query_cache.generation
+        if self.generation == generation:
+            return 0
+        if self.built_at() is None:
+            self.rebuild()
+        applied = self.consumer.drain(lambda events: self._transaction(self._apply, events))
+        self.generation = generation
+        return applied
+
+    def query(self, name):
+        with self._lock:
+            self.sync()
+            return self.conn.execute(QUERIES[name]).fetchall()
+
+    def weak_subjects(self):
+        return self.query("weak_subjects")
+
+    def subject_hours(self):
+        return self.query("subject_hours")
+
+    def history_columns(self, name):
+        """A pa_trends history straight into arrays, shaped like
+        pa_trends.load_columns' result."""
+        table, label, columns = HISTORIES[name]
+        dated = f"SELECT * FROM {table} WHERE date_ts IS NOT NULL"
+        with self._lock:
+            self.sync()
+            labels = [row[0] for row in self.conn.execute(
+                f"SELECT DISTINCT {label} FROM ({dated}) ORDER BY {label}").fetchall()]
+            data = self.conn.execute(f"""
+                WITH codes AS (SELECT {label}, ROW_NUMBER() OVER (ORDER BY {label}) - 1 AS code
+                               FROM (SELECT DISTINCT {label} FROM ({dated})))
+                SELECT codes.code AS {label}, {columns}
+                FROM ({dated}) AS history JOIN codes USING ({label})""").fetchnumpy()
+        result = {key: np.asarray(values) for key, values in data.items()}
+        result["labels"] = labels
+        return result
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+# One mirror per database, least recently used closed beyond
+# pa_db.MAX_OPEN_SHARDS.
+_mirrors = OrderedDict()
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror():
+    """The current database's mirror."""
+    path = pa_db.current_path()
+    with _mirrors_lock:
+        if path not in _mirrors:
+            _mirrors[path] = ColumnarMirror(path)
+        _mirrors.move_to_end(path)
+        while len(_mirrors) > pa_db.MAX_OPEN_SHARDS:
+            _mirrors.popitem(last=False)[1].close()
+        return _mirrors[path]
+
+
+def enable():
+    """Load pa_trends' history from the mirror from now on."""
+    global active
+    if duckdb is None or pa is None:
+        raise RuntimeError("AI_PA_ANALYTICS=duckdb needs the duckdb and pyarrow packages "
+                           "(pip install duckdb pyarrow)")
+    active = True
+
+
+def disable():
+    global active
+    active = False
+    with _mirrors_lock:
+        while _mirrors:
+            _mirrors.popitem()[1].close()
@@ -0,0 +1,1879 @@
+"""Data-access layer for Kriti's PA Agent.
+
+Streamlit re-executes ``ai_pa_system.py`` on every interaction, but imported
+modules live for the whole server process. Keeping connections and schema
+setup here means a rerun only pays for the queries it actually runs.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import wraps
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger("ai_pa.db")
+
+DB_PATH = os.environ.get("AI_PA_DB", "ai_pa.db")
+POOL_SIZE = int(os.environ.get("AI_PA_POOL_SIZE", "4"))
+# Multi-user mode: one database file per user under SHARD_DIR, at most
+# MAX_OPEN_SHARDS of them with live pools (least recently used are closed).
+SHARD_DIR = os.environ.get("AI_PA_SHARD_DIR", "shards")
+SHARD_POOL_SIZE = int(os.environ.get("AI_PA_SHARD_POOL_SIZE", "2"))
+MAX_OPEN_SHARDS = int(os.environ.get("AI_PA_MAX_OPEN_SHARDS", "64"))
+CACHE_SIZE = int(os.environ.get("AI_PA_CACHE_SIZE", "128"))
+MIGRATION_BATCH = int(os.environ.get("AI_PA_MIGRATION_BATCH", "5000"))
+# Journal events read per round-trip by get_events() and pa_journal consumers.
+EVENT_BATCH = int(os.environ.get("AI_PA_EVENT_BATCH", "1000"))
+# Search ranks at most this many of a query's newest matches, so a common
+# term doesn't score every row in the index.
+SEARCH_CANDIDATES = int(os.environ.get("AI_PA_SEARCH_CANDIDATES", "1000"))
+# Rows copied per round-trip when pa_columnar syncs its DuckDB mirror.
+MIRROR_BATCH = int(os.environ.get("AI_PA_MIRROR_BATCH", "50000"))
+# Group commit: the writer commits every write queued up while the previous
+# commit ran (up to WRITE_BATCH_MAX) in one transaction, optionally waiting
+# GROUP_COMMIT_MS longer for more. Waiting only pays off with slow fsyncs.
+GROUP_COMMIT_MS = float(os.environ.get("AI_PA_GROUP_COMMIT_MS", "0"))
+WRITE_BATCH_MAX = int(os.environ.get("AI_PA_WRITE_BATCH_MAX", "256"))
+# Futures resolve after COMMIT and callers take that as durable, so the
+# writer's connection syncs the WAL on every commit (NORMAL can lose the last
+# commits on power loss); group commit spreads each fsync over the batch.
+WRITER_SYNCHRONOUS = os.environ.get("AI_PA_WRITER_SYNCHRONOUS", "FULL")
+
+# Applied to every pooled connection. WAL lets readers run alongside the
+# single writer; NORMAL sync is durable in WAL mode except on power loss
+# (the writer's own connection uses WRITER_SYNCHRONOUS).
+PRAGMAS = (
+    # Only takes effect on a new database; migration 3 converts old ones.
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 67108864",
+)
+
+# ==================== SCHEMA ====================
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY,
+        title TEXT,
+        description TEXT,
+        category TEXT,
+        task_type TEXT,
+        due_date TEXT,
+        priority TEXT,
+        status TEXT,
+        created_date TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS study_progress (
+        id INTEGER PRIMARY KEY,
+        subject TEXT,
+        date TEXT,
+        hours_spent REAL,
+        clarity_rating INTEGER,
+        notes TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS mock_scores (
+        id INTEGER PRIMARY KEY,
+        exam_type TEXT,
+        score INTEGER,
+        total_points INTEGER,
+        date TEXT,
+        notes TEXT
+    )''',
+    # Per-subject running totals over study_progress, kept current by the
+    # triggers below so analytics read one row per subject, not per session.
+    '''CREATE TABLE IF NOT EXISTS subject_stats (
+        subject TEXT PRIMARY KEY,
+        total_hours REAL NOT NULL DEFAULT 0,
+        total_clarity INTEGER NOT NULL DEFAULT 0,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        last_studied TEXT
+    )''',
+)
+
+TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS trg_study_insert AFTER INSERT ON study_progress
+    BEGIN
+        INSERT INTO subject_stats (subject, total_hours, total_clarity, sessions, last_studied)
+        VALUES (NEW.subject, COALESCE(NEW.hours_spent, 0), COALESCE(NEW.clarity_rating, 0), 1, NEW.date)
+        ON CONFLICT(subject) DO UPDATE SET
+            total_hours = total_hours + excluded.total_hours,
+            total_clarity = total_clarity + excluded.total_clarity,
+            sessions = sessions + 1,
+            last_studied = MAX(COALESCE(last_studied, ''), COALESCE(excluded.last_studied, ''));
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_study_delete AFTER DELETE ON study_progress
+    BEGIN
+        UPDATE subject_stats SET
+            total_hours = total_hours - COALESCE(OLD.hours_spent, 0),
+            total_clarity = total_clarity - COALESCE(OLD.clarity_rating, 0),
+            sessions = sessions - 1,
+            last_studied = (SELECT MAX(date) FROM study_progress WHERE subject = OLD.subject)
+        WHERE subject = OLD.subject;
+        DELETE FROM subject_stats WHERE subject = OLD.subject AND sessions <= 0;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_study_update
+    AFTER UPDATE OF subject, date, hours_spent, clarity_rating ON study_progress
+    BEGIN
+        UPDATE subject_stats SET
+            total_hours = total_hours - COALESCE(OLD.hours_spent, 0),
+            total_clarity = total_clarity - COALESCE(OLD.clarity_rating, 0),
+            sessions = sessions - 1
+        WHERE subject = OLD.subject;
+        INSERT INTO subject_stats (subject, total_hours, total_clarity, sessions)
+        VALUES (NEW.subject, COALESCE(NEW.hours_spent, 0), COALESCE(NEW.clarity_rating, 0), 1)
+        ON CONFLICT(subject) DO UPDATE SET
+            total_hours = total_hours + excluded.total_hours,
+            total_clarity = total_clarity + excluded.total_clarity,
+            sessions = sessions + 1;
+        UPDATE subject_stats
+        SET last_studied = (SELECT MAX(date) FROM study_progress WHERE subject = subject_stats.subject)
+        WHERE subject IN (OLD.subject, NEW.subject);
+        DELETE FROM subject_stats WHERE subject = OLD.subject AND sessions <= 0;
+    END''',
+)
+
+# Indexes on the original columns. Indexes on columns added by a migration
+# are created by that migration. Checked by tools/check_query_plans.py.
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_study_subject_date ON study_progress(subject, date)",
+    # Superseded by subject_stats.
+    "DROP INDEX IF EXISTS idx_study_subject_clarity",
+)
+
+# ==================== MIGRATIONS ====================
+
+# Integer twins of the TEXT date columns: (table, text column, integer
+# column, SQL computing it). Timestamps are naive local time, so they are
+# encoded as if UTC and day numbers keep the calendar date.
+_SECONDS = "CAST(strftime('%s', {}) AS INTEGER)"
+_DAYS = "CAST(strftime('%s', {}) AS INTEGER) / 86400"
+# Tasks with a missing or unparseable due date sort first, as NULL text did,
+# but keep a real key so keyset pages can step past them.
+NO_DUE_DAY = -999999
+DATE_COLUMNS = (
+    ("tasks", "due_date", "due_day", f"COALESCE({_DAYS}, {NO_DUE_DAY})"),
+    ("tasks", "created_date", "created_ts", _SECONDS),
+    ("study_progress", "date", "date_ts", _SECONDS),
+    ("study_progress", "date", "date_day", _DAYS),
+    ("mock_scores", "date", "date_ts", _SECONDS),
+    ("mock_scores", "date", "date_day", _DAYS),
+)
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(conn, table, column, decl):
+    if column not in _columns(conn, table):
+        try:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        except sqlite3.OperationalError as exc:
+            # Another process added it between the check and the ALTER.
+            if "duplicate column" not in str(exc):
+                raise
+
+
+def _backfill(conn, table, sql, batch_size):
+    """Run ``sql`` (bound to an id range ``id > ? AND id <= ?``) over
+    ``table`` in batches, one commit each."""
+    max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    for low in range(0, max_id, batch_size):
+        with conn:
+            conn.execute(sql, (low, min(low + batch_size, max_id)))
+
+
+def _migrate_integer_dates(conn, batch_size):
+    tables = {}
+    for table, source, column, expr in DATE_COLUMNS:
+        tables.setdefault(table, []).append((source, column, expr))
+    for table, columns in tables.items():
+        for source, column, expr in columns:
+            _add_column(conn, table, column, "INTEGER")
+        # Triggers first, so rows written during the backfill are covered too.
+        missing = " OR ".join(f"NEW.{column} IS NULL" for _, column, _ in columns)
+        fill = ", ".join(f"{column} = COALESCE(NEW.{column}, {expr.format('NEW.' + source)})"
+                         for source, column, expr in columns)
+        recompute = ", ".join(f"{column} = {expr.format('NEW.' + source)}"
+                              for source, column, expr in columns)
+        sources = ", ".join(sorted({source for source, _, _ in columns}))
+        with conn:
+            conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_dates_insert
+                AFTER INSERT ON {table} WHEN {missing}
+                BEGIN UPDATE {table} SET {fill} WHERE id = NEW.id; END""")
+            conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_dates_update
+                AFTER UPDATE OF {sources} ON {table}
+                BEGIN UPDATE {table} SET {recompute} WHERE id = NEW.id; END""")
+        assignments = ", ".join(f"{column} = COALESCE({column}, {expr.format(source)})"
+                                for source, column, expr in columns)
+        _backfill(conn, table, f"UPDATE {table} SET {assignments} WHERE id > ? AND id <= ?",
+                  batch_size)
+    with conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_due_day ON tasks(status, due_day)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_category_status_due_day "
+                     "ON tasks(category, status, due_day)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_study_date_ts ON study_progress(date_ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_mock_date_ts ON mock_scores(date_ts)")
+        for old in ("idx_tasks_status_due", "idx_tasks_category_status_due", "idx_study_date", "idx_mock_date"):
+            conn.execute(f"DROP INDEX IF EXISTS {old}")
+
+
+# Full-text search over every free-text column: (table, kind, title column,
+# body column, date column). A row's search rowid is id * SEARCH_STRIDE plus
+# its source's position, so triggers can address it without a lookup.
+SEARCH_SOURCES = (
+    ("tasks", "task", "title", "description", "due_date"),
+    ("study_progress", "study", "subject", "notes", "date"),
+    ("mock_scores", "mock", "exam_type", "notes", "date"),
+)
+SEARCH_STRIDE = 4
+# Titles weigh more than bodies in the bm25 ranking.
+SEARCH_RANK = "bm25(10.0, 1.0)"
+
+
+def _migrate_search_index(conn, batch_size):
+    with conn:
+        # Rebuilt from scratch, so a half-finished earlier run is harmless.
+        conn.execute("DROP TABLE IF EXISTS search_index")
+        conn.execute("""CREATE VIRTUAL TABLE search_index USING fts5(
+            title, body, kind UNINDEXED, day UNINDEXED,
+            tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')""")
+        conn.execute("INSERT INTO search_index (search_index, rank) VALUES ('rank', ?)", (SEARCH_RANK,))
+    for offset, (table, kind, title, body, day) in enumerate(SEARCH_SOURCES, 1):
+        rowid = f"{{}}.id * {SEARCH_STRIDE} + {offset}"
+        values = f"{rowid.format('NEW')}, NEW.{title}, COALESCE(NEW.{body}, ''), '{kind}', NEW.{day}"
+        with conn:
+            conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_search_insert
+                AFTER INSERT ON {table}
+                BEGIN INSERT INTO search_index (rowid, title, body, kind, day) VALUES ({values}); END""")
+            conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_search_update
+                AFTER UPDATE OF {title}, {body}, {day} ON {table}
+                BEGIN
+                    DELETE FROM search_index WHERE rowid = {rowid.format('OLD')};
+                    INSERT INTO search_index (rowid, title, body, kind, day) VALUES ({values});
+                END""")
+            conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_search_delete
+                AFTER DELETE ON {table}
+                BEGIN DELETE FROM search_index WHERE rowid = {rowid.format('OLD')}; END""")
+        _backfill(conn, table, f"""INSERT INTO search_index (rowid, title, body, kind, day)
+                  SELECT id * {SEARCH_STRIDE} + {offset}, {title}, COALESCE({body}, ''), '{kind}', {day}
+                  FROM {table} WHERE id > ? AND id <= ?""", batch_size)
+    with conn:
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+# Naive local time encoded as UTC, like epoch_seconds(datetime.now()).
+_NOW_SECONDS = "CAST(strftime('%s', 'now', 'localtime') AS INTEGER)"
+# When a task completed before completed_ts existed most likely was: on its
+# due day, or when it was created if that was later, but never in the future.
+def _estimated_completion(due_seconds, created_ts):
+    return (f"MIN({_NOW_SECONDS}, COALESCE(MAX({due_seconds}, {created_ts}), "
+            f"{due_seconds}, {created_ts}, {_NOW_SECONDS}))")
+
+
+_DUE_SECONDS = f"NULLIF(due_day, {NO_DUE_DAY}) * 86400"
+_ESTIMATED_COMPLETION = _estimated_completion(_DUE_SECONDS, "created_ts")
+# A task inserted already completed (an import) is history too, so it is
+# dated the same way. The date-key triggers may not have filled in due_day
+# and created_ts yet, so this reads the text columns when they haven't.
+_INSERTED_COMPLETION = _estimated_completion(
+    f"COALESCE(NULLIF(NEW.due_day, {NO_DUE_DAY}), {_DAYS.format('NEW.due_date')}) * 86400",
+    f"COALESCE(NEW.created_ts, {_SECONDS.format('NEW.created_date')})")
+COMPLETED_TS_INSERT_TRIGGER = f'''CREATE TRIGGER IF NOT EXISTS trg_tasks_completed_ts_insert
+    AFTER INSERT ON tasks WHEN NEW.status IS 'completed' AND NEW.completed_ts IS NULL
+    BEGIN UPDATE tasks SET completed_ts = {_INSERTED_COMPLETION} WHERE id = NEW.id; END'''
+# Completed tasks end up in tasks_archive (see pa_archive). The completed
+# counter spans both tables, so analytics never count rows.
+COUNTER_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS trg_tasks_completed_insert
+    AFTER INSERT ON tasks WHEN NEW.status IS 'completed'
+    BEGIN UPDATE task_counters SET value = value + 1 WHERE name = 'completed'; END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_tasks_completed_update
+    AFTER UPDATE OF status ON tasks WHEN (OLD.status IS 'completed') != (NEW.status IS 'completed')
+    BEGIN
+        UPDATE task_counters SET value = value + (CASE WHEN NEW.status IS 'completed' THEN 1 ELSE -1 END)
+        WHERE name = 'completed';
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_tasks_completed_delete
+    AFTER DELETE ON tasks WHEN OLD.status IS 'completed'
+    BEGIN UPDATE task_counters SET value = value - 1 WHERE name = 'completed'; END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_archive_insert AFTER INSERT ON tasks_archive
+    BEGIN UPDATE task_counters SET value = value + 1 WHERE name = 'completed'; END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_archive_delete AFTER DELETE ON tasks_archive
+    BEGIN UPDATE task_counters SET value = value - 1 WHERE name = 'completed'; END''',
+    # Stamp completions however they happen (app or import), so every
+    # completed task ages towards the archive.
+    f'''CREATE TRIGGER IF NOT EXISTS trg_tasks_completed_ts
+    AFTER UPDATE OF status ON tasks WHEN NEW.status IS 'completed' AND NEW.completed_ts IS NULL
+    BEGIN UPDATE tasks SET completed_ts = {_NOW_SECONDS} WHERE id = NEW.id; END''',
+    COMPLETED_TS_INSERT_TRIGGER,
+)
+
+
+def _migrate_task_archive(conn, batch_size):
+    _add_column(conn, "tasks", "completed_ts", "INTEGER")
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            title TEXT,
+            description TEXT,
+            category TEXT,
+            task_type TEXT,
+            due_date TEXT,
+            priority TEXT,
+            status TEXT,
+            created_date TEXT,
+            due_day INTEGER,
+            created_ts INTEGER,
+            completed_ts INTEGER NOT NULL,
+            archived_ts INTEGER NOT NULL
+        )''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_completed_ts ON tasks_archive(completed_ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_completed_ts ON tasks(status, completed_ts)")
+        conn.execute('''CREATE TABLE IF NOT EXISTS task_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS maintenance_log (
+            ran_ts INTEGER NOT NULL,
+            archived INTEGER NOT NULL,
+            freed_pages INTEGER NOT NULL,
+            seconds REAL NOT NULL
+        )''')
+        for ddl in COUNTER_TRIGGERS:
+            conn.execute(ddl)
+        # Counted from scratch in the transaction that adds the triggers, so
+        # no completion is missed or counted twice.
+        conn.execute('''INSERT OR REPLACE INTO task_counters VALUES ('completed',
+                     (SELECT COUNT(*) FROM tasks WHERE status = 'completed')
+                     + (SELECT COUNT(*) FROM tasks_archive))''')
+    # When these were completed wasn't recorded; estimate it from the task.
+    _backfill(conn, "tasks", f'''UPDATE tasks SET completed_ts = {_ESTIMATED_COMPLETION}
+              WHERE status = 'completed' AND completed_ts IS NULL AND id > ? AND id <= ?''', batch_size)
+    # Files created before PRAGMAS set auto_vacuum stay without it until a
+    # full VACUUM, which needs the database to itself, so it isn't run here:
+    # see ``python pa_archive.py --vacuum``.
+
+
+# Per-day rollups behind analytics_summary(): a date range sums at most one
+# row per day (per category for tasks), however long the history. Kept by
+# the triggers below; completions count on the day of completed_ts (an
+# estimate for tasks completed before it existed), and a task moving to
+# tasks_archive leaves its day unchanged.
+ROLLUPS = (
+    '''CREATE TABLE IF NOT EXISTS study_daily (
+        day INTEGER PRIMARY KEY,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        hours REAL NOT NULL DEFAULT 0,
+        clarity INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS mock_daily (
+        day INTEGER PRIMARY KEY,
+        mocks INTEGER NOT NULL DEFAULT 0,
+        scored INTEGER NOT NULL DEFAULT 0,
+        percentage REAL NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS task_daily (
+        day INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        completed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, category)
+    )''',
+)
+# (source table, rollup, [(key column, expression)], [(value column,
+# expression)], source columns that move a row). Expressions read the row
+# as {row}: NEW or OLD in triggers, the table itself when backfilling. Rows
+# whose first key is NULL (no date, not completed) aren't counted.
+_COMPLETION_KEYS = [("day", "{row}.completed_ts / 86400"), ("category", "COALESCE({row}.category, '')")]
+ROLLUP_SOURCES = (
+    ("study_progress", "study_daily", [("day", "{row}.date_day")],
+     [("sessions", "1"), ("hours", "COALESCE({row}.hours_spent, 0)"),
+      ("clarity", "COALESCE({row}.clarity_rating, 0)")],
+     "date_day, hours_spent, clarity_rating"),
+    ("mock_scores", "mock_daily", [("day", "{row}.date_day")],
+     [("mocks", "1"), ("scored", "COALESCE({row}.total_points > 0, 0)"),
+      ("percentage", "COALESCE({row}.score * 100.0 / NULLIF({row}.total_points, 0), 0)")],
+     "date_day, score, total_points"),
+    ("tasks", "task_daily", _COMPLETION_KEYS, [("completed", "1")], "completed_ts, category"),
+    ("tasks_archive", "task_daily", _COMPLETION_KEYS, [("completed", "1")], "completed_ts, category"),
+)
+
+
+def _rollup_upsert(rollup, keys, values, row, aggregate=False):
+    """INSERT ... ON CONFLICT adding ``row``'s values (their SUMs over the
+    table ``row`` with ``aggregate``) to its rollup rows."""
+    names = [name for name, _ in keys + values]
+    key_exprs = [expr.format(row=row) for _, expr in keys]
+    value_exprs = [expr.format(row=row) for _, expr in values]
+    sql = f"INSERT INTO {rollup} ({', '.join(names)}) SELECT "
+    if aggregate:
+        sql += f"{', '.join(key_exprs)}, {', '.join(f'SUM({e})' for e in value_exprs)} FROM {row}"
+    else:
+        sql += ", ".join(key_exprs + value_exprs)
+    sql += f" WHERE {key_exprs[0]} IS NOT NULL"
+    if aggregate:
+        sql += f" GROUP BY {', '.join(str(i + 1) for i in range(len(keys)))}"
+    updates = ", ".join(f"{name} = {name} + excluded.{name}" for name, _ in values)
+    return sql + f" ON CONFLICT({', '.join(name for name, _ in keys)}) DO UPDATE SET {updates}"
+
+
+def _rollup_triggers(source, rollup, keys, values, watched):
+    add = _rollup_upsert(rollup, keys, values, "NEW")
+    remove = (f"UPDATE {rollup} SET "
+              + ", ".join(f"{name} = {name} - {expr.format(row='OLD')}" for name, expr in values)
+              + " WHERE " + " AND ".join(f"{name} = {expr.format(row='OLD')}" for name, expr in keys))
+    prefix = f"CREATE TRIGGER IF NOT EXISTS trg_{source}_{rollup}"
+    return (
+        f"{prefix}_insert AFTER INSERT ON {source} BEGIN {add}; END",
+        f"{prefix}_delete AFTER DELETE ON {source} BEGIN {remove}; END",
+        f"{prefix}_update AFTER UPDATE OF {watched} ON {source} BEGIN {remove}; {add}; END",
+    )
+
+
+def _migrate_daily_rollups(conn, batch_size):
+    with conn:
+        for ddl in ROLLUPS:
+            conn.execute(ddl)
+        # An undone completion no longer has a completion day.
+        conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_tasks_uncompleted
+            AFTER UPDATE OF status ON tasks
+            WHEN OLD.status IS 'completed' AND NEW.status IS NOT 'completed'
+            BEGIN
+                UPDATE tasks SET completed_ts = NULL WHERE id = NEW.id;
+            END''')
+        conn.execute("UPDATE tasks SET completed_ts = NULL WHERE status IS NOT 'completed'")
+        # Filled from history in the transaction that adds the triggers, so
+        # no row is missed or counted twice.
+        for source, rollup, keys, values, watched in ROLLUP_SOURCES:
+            for ddl in _rollup_triggers(source, rollup, keys, values, watched):
+                conn.execute(ddl)
+            conn.execute(_rollup_upsert(rollup, keys, values, source, aggregate=True))
+
+
+# Bar subjects a mock covered, one row per (subject, mock); filled by
+# log_mock from the form's subjects field and, for mocks written any other
+# way, from the subjects their notes name (see tag_mocks_from_notes).
+MOCK_SUBJECTS = (
+    '''CREATE TABLE IF NOT EXISTS mock_subjects (
+        subject TEXT NOT NULL,
+        mock_id INTEGER NOT NULL,
+        PRIMARY KEY (subject, mock_id)
+    ) WITHOUT ROWID''',
+    "CREATE INDEX IF NOT EXISTS idx_mock_subjects_mock ON mock_subjects(mock_id)",
+    '''CREATE TRIGGER IF NOT EXISTS trg_mock_scores_subjects_delete AFTER DELETE ON mock_scores
+    BEGIN DELETE FROM mock_subjects WHERE mock_id = OLD.id; END''',
+)
+
+
+def tag_mocks_from_notes(conn, low, high):
+    """Tag the untagged mocks with ``low < id <= high`` with the subjects
+    their notes name; the caller commits."""
+    rows = conn.execute("""SELECT id, notes FROM mock_scores WHERE id > ? AND id <= ?
+                        AND id NOT IN (SELECT mock_id FROM mock_subjects)""", (low, high)).fetchall()
+    conn.executemany("INSERT OR IGNORE INTO mock_subjects (subject, mock_id) VALUES (?, ?)",
+                     [(subject, mock_id) for mock_id, notes in rows for subject in parse_subjects(notes)])
+
+
+def _migrate_mock_subjects(conn, batch_size):
+    with conn:
+        for ddl in MOCK_SUBJECTS:
+            conn.execute(ddl)
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM mock_scores").fetchone()[0]
+    for low in range(0, max_id, batch_size):
+        with conn:
+            tag_mocks_from_notes(conn, low, low + batch_size)
+
+
+# Per-subject totals over scored mocks (total_points > 0) through
+# mock_subjects, kept by triggers like subject_stats so the Analytics page
+# reads one row per subject. A mock's percentage is read from mock_scores:
+# tagging or untagging adds or removes it, deleting or rescoring the mock
+# itself is handled on mock_scores (BEFORE DELETE, since the junction rows
+# go after the mock and can't see its score any more).
+def _mock_percentage(row):
+    return f"COALESCE({row}.score, 0) * 100.0 / {row}.total_points"
+
+
+def _tag_mock(subject, mock_id):
+    return f'''INSERT INTO mock_subject_totals (subject, mocks, percentage)
+        SELECT {subject}, 1, {_mock_percentage("m")} FROM mock_scores m
+        WHERE m.id = {mock_id} AND m.total_points > 0
+        ON CONFLICT(subject) DO UPDATE SET
+            mocks = mocks + 1,
+            percentage = percentage + excluded.percentage;'''
+
+
+def _untag_mock(subject, mock_id):
+    return f'''UPDATE mock_subject_totals SET
+            mocks = mocks - 1,
+            percentage = percentage - (SELECT {_mock_percentage("m")} FROM mock_scores m WHERE m.id = {mock_id})
+        WHERE subject = {subject}
+        AND EXISTS (SELECT 1 FROM mock_scores m WHERE m.id = {mock_id} AND m.total_points > 0);
+        DELETE FROM mock_subject_totals WHERE subject = {subject} AND mocks <= 0;'''
+
+
+def _scored(row):
+    return f"CASE WHEN {row}.total_points > 0 THEN {{}} ELSE 0 END"
+
+
+MOCK_SUBJECT_TOTALS = (
+    '''CREATE TABLE IF NOT EXISTS mock_subject_totals (
+        subject TEXT PRIMARY KEY,
+        mocks INTEGER NOT NULL DEFAULT 0,
+        percentage REAL NOT NULL DEFAULT 0
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_mock_subjects_totals_insert AFTER INSERT ON mock_subjects
+    BEGIN {_tag_mock("NEW.subject", "NEW.mock_id")} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_mock_subjects_totals_delete AFTER DELETE ON mock_subjects
+    BEGIN {_untag_mock("OLD.subject", "OLD.mock_id")} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_mock_subjects_totals_update AFTER UPDATE ON mock_subjects
+    BEGIN {_untag_mock("OLD.subject", "OLD.mock_id")} {_tag_mock("NEW.subject", "NEW.mock_id")} END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_mock_scores_totals_delete BEFORE DELETE ON mock_scores
+    WHEN OLD.total_points > 0
+    BEGIN
+        UPDATE mock_subject_totals SET
+            mocks = mocks - 1,
+            percentage = percentage - {_mock_percentage("OLD")}
+        WHERE subject IN (SELECT subject FROM mock_subjects WHERE mock_id = OLD.id);
+        DELETE FROM mock_subject_totals WHERE mocks <= 0
+        AND subject IN (SELECT subject FROM mock_subjects WHERE mock_id = OLD.id);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_mock_scores_totals_update
+    AFTER UPDATE OF score, total_points ON mock_scores
+    BEGIN
+        INSERT INTO mock_subject_totals (subject) SELECT subject FROM mock_subjects WHERE mock_id = NEW.id
+        ON CONFLICT(subject) DO NOTHING;
+        UPDATE mock_subject_totals SET
+            mocks = mocks - {_scored("OLD").format(1)} + {_scored("NEW").format(1)},
+            percentage = percentage - {_scored("OLD").format(_mock_percentage("OLD"))}
+                                    + {_scored("NEW").format(_mock_percentage("NEW"))}
+        WHERE subject IN (SELECT subject FROM mock_subjects WHERE mock_id = NEW.id);
+        DELETE FROM mock_subject_totals WHERE mocks <= 0
+        AND subject IN (SELECT subject FROM mock_subjects WHERE mock_id = NEW.id);
+    END''',
+)
+
+
+def _migrate_mock_subject_totals(conn, batch_size):
+    with conn:
+        for ddl in MOCK_SUBJECT_TOTALS:
+            conn.execute(ddl)
+        # Filled in the transaction that adds the triggers, so no tag is
+        # missed or counted twice.
+        conn.execute(f"""INSERT OR REPLACE INTO mock_subject_totals (subject, mocks, percentage)
+                     SELECT s.subject, COUNT(*), TOTAL({_mock_percentage("m")})
+                     FROM mock_subjects s JOIN mock_scores m ON m.id = s.mock_id
+                     WHERE m.total_points > 0 GROUP BY s.subject""")
+
+
+# Append-only journal of app writes, one event per write_listeners event and
+# in the same transaction as the write (see WriteQueue), numbered by seq.
+# AUTOINCREMENT keeps seq increasing even across deletes of the last row,
+# which the triggers forbid anyway. Consumers store how far they have read.
+JOURNAL = (
+    '''CREATE TABLE IF NOT EXISTS events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        entity TEXT NOT NULL,
+        action TEXT NOT NULL,
+        payload TEXT NOT NULL
+    )''',
+    "CREATE INDEX IF NOT EXISTS idx_events_action ON events(action)",
+    '''CREATE TRIGGER IF NOT EXISTS trg_events_no_update BEFORE UPDATE ON events
+    BEGIN SELECT RAISE(ABORT, 'events is append-only'); END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_events_no_delete BEFORE DELETE ON events
+    BEGIN SELECT RAISE(ABORT, 'events is append-only'); END''',
+    '''CREATE TABLE IF NOT EXISTS consumer_offsets (
+        consumer TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL
+    )''',
+)
+
+
+def _migrate_event_journal(conn, batch_size):
+    with conn:
+        for ddl in JOURNAL:
+            conn.execute(ddl)
+
+
+# An archived task stays searchable: archiving inserts the tasks_archive row
+# before deleting the task, so the task's delete trigger sees it and keeps
+# the search entry (same id, same rowid), which then goes with the archive
+# row. Tasks are SEARCH_SOURCES[0], hence rowid id * SEARCH_STRIDE + 1.
+ARCHIVE_SEARCH = (
+    "DROP TRIGGER IF EXISTS trg_tasks_search_delete",
+    f'''CREATE TRIGGER trg_tasks_search_delete AFTER DELETE ON tasks
+    WHEN NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id)
+    BEGIN DELETE FROM search_index WHERE rowid = OLD.id * {SEARCH_STRIDE} + 1; END''',
+    f'''CREATE TRIGGER IF NOT EXISTS trg_tasks_archive_search_delete AFTER DELETE ON tasks_archive
+    BEGIN DELETE FROM search_index WHERE rowid = OLD.id * {SEARCH_STRIDE} + 1; END''',
+)
+
+
+def _migrate_archive_search(conn, batch_size):
+    with conn:
+        for ddl in ARCHIVE_SEARCH:
+            conn.execute(ddl)
+        # Archiving used to take the newest task too, so the next task would
+        # reuse its id; move it back so new ids continue past the archive.
+        newest = conn.execute(f"""SELECT {ARCHIVE_COLUMNS} FROM tasks_archive
+                              WHERE id > (SELECT COALESCE(MAX(id), 0) FROM tasks)
+                              ORDER BY id DESC LIMIT 1""").fetchone()
+        if newest:
+            conn.execute("DELETE FROM tasks_archive WHERE id = ?", (newest[0],))
+            conn.execute(f"""INSERT INTO tasks ({TASK_COLUMNS}, due_day, created_ts, completed_ts)
+                         VALUES ({", ".join("?" * (len(newest) - 1))})""", newest[:-1])
+    # Tasks archived before this lost their entries; index them again.
+    _backfill(conn, "tasks_archive", f"""INSERT INTO search_index (rowid, title, body, kind, day)
+              SELECT id * {SEARCH_STRIDE} + 1, title, COALESCE(description, ''), 'task', due_date
+              FROM tasks_archive WHERE id > ? AND id <= ?
+              AND NOT EXISTS (SELECT 1 FROM search_index WHERE rowid = tasks_archive.id * {SEARCH_STRIDE} + 1)""",
+              batch_size)
+
+
+def _migrate_completion_dates(conn, batch_size):
+    # Migration 3 used to stamp every earlier completion with the time it
+    # ran, so they all counted as recent in analytics ranges; every
+    # completed_ts up to when it finished is one of those.
+    applied = conn.execute("SELECT applied_at FROM schema_version WHERE version = 3").fetchone()
+    if applied is None:
+        return
+    stamped = epoch_seconds(applied[0])
+    for table in ("tasks", "tasks_archive"):
+        _backfill(conn, table, f"""UPDATE {table} SET completed_ts = {_ESTIMATED_COMPLETION}
+                  WHERE completed_ts <= {stamped} AND id > ? AND id <= ?""", batch_size)
+
+
+def _migrate_imported_completions(conn, batch_size):
+    # Tasks imported as completed used to be stamped with the import time.
+    with conn:
+        conn.execute("DROP TRIGGER IF EXISTS trg_tasks_completed_ts_insert")
+        conn.execute(COMPLETED_TS_INSERT_TRIGGER)
+
+
+# Ordered (version, name, migrate(conn, batch_size)). Each migration must be
+# safe to re-run: a crash part-way leaves the version unrecorded.
+MIGRATIONS = [
+    (1, "integer_dates", _migrate_integer_dates),
+    (2, "search_index", _migrate_search_index),
+    (3, "task_archive", _migrate_task_archive),
+    (4, "daily_rollups", _migrate_daily_rollups),
+    (5, "mock_subjects", _migrate_mock_subjects),
+    (6, "event_journal", _migrate_event_journal),
+    (7, "archive_search", _migrate_archive_search),
+    (8, "completion_dates", _migrate_completion_dates),
+    (9, "mock_subject_totals", _migrate_mock_subject_totals),
+    (10, "imported_completions", _migrate_imported_completions),
+]
+
+
+def run_migrations(conn, batch_size=MIGRATION_BATCH):
+    """Apply every migration newer than schema_version; returns the version."""
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )''')
+    applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(conn, batch_size)
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO schema_version VALUES (?, ?, ?)",
+                         (version, name, datetime.now().isoformat()))
+    return max([version for version, _, _ in MIGRATIONS], default=0)
+
+
+def schema_version():
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+# ==================== QUERIES ====================
+
+TASK_COLUMNS = "id, title, description, category, task_type, due_date, priority, status, created_date"
+STUDY_COLUMNS = "id, subject, date, hours_spent, clarity_rating, notes"
+MOCK_COLUMNS = "id, exam_type, score, total_points, date, notes"
+ARCHIVE_COLUMNS = f"{TASK_COLUMNS}, due_day, created_ts, completed_ts, archived_ts"
+
+# The id for a new row, for inserts to pass explicitly. tasks ids aren't
+# AUTOINCREMENT, so SQLite alone would hand out MAX(tasks.id) + 1 -- an
+# archived task's id once the newest tasks are archived or undone -- and the
+# search index keys rows by id; task ids continue past the archive instead.
+NEXT_ID = {
+    "tasks": """(SELECT COALESCE(MAX(id), 0) + 1 FROM (SELECT MAX(id) AS id FROM tasks
+                 UNION ALL SELECT MAX(id) FROM tasks_archive))""",
+    "study_progress": "(SELECT COALESCE(MAX(id), 0) + 1 FROM study_progress)",
+    "mock_scores": "(SELECT COALESCE(MAX(id), 0) + 1 FROM mock_scores)",
+}
+
+# How undo() reverts each journaled action, run once per id in its payload
+# ("ids", or the single "id"). Other actions (archiving) aren't undoable.
+UNDO = {
+    "add_task": "DELETE FROM tasks WHERE id = ?",
+    "complete_tasks": "UPDATE tasks SET status = 'pending' WHERE id = ? AND status = 'completed'",
+    "log_study": "DELETE FROM study_progress WHERE id = ?",
+    "log_mock": "DELETE FROM mock_scores WHERE id = ?",
+}
+
+# Every read the app issues, by name. Keeping them in one place lets the
+# query-plan check EXPLAIN exactly the SQL that runs.
+QUERIES = {
+    "pending_tasks": f"""SELECT {TASK_COLUMNS} FROM tasks
+                 WHERE status = 'pending'
+                 ORDER BY due_day ASC, id ASC""",
+    # Task lists page by keyset on (due_day, id), so rows end with the stored
+    # due_day the keys are built from; LIMIT -1 means no limit.
+    "pending_tasks_by_category": f"""SELECT {TASK_COLUMNS}, due_day FROM tasks
+                 WHERE category = ? AND status = 'pending'
+                 ORDER BY due_day ASC, id ASC LIMIT ?""",
+    "pending_tasks_by_category_after": f"""SELECT {TASK_COLUMNS}, due_day FROM tasks
+                 WHERE category = ? AND status = 'pending' AND (due_day, id) > (?, ?)
+                 ORDER BY due_day ASC, id ASC LIMIT ?""",
+    "pending_tasks_by_category_before": f"""SELECT {TASK_COLUMNS}, due_day FROM tasks
+                 WHERE category = ? AND status = 'pending' AND (due_day, id) < (?, ?)
+                 ORDER BY due_day DESC, id DESC LIMIT ?""",
+    "urgent_tasks": f"""SELECT {TASK_COLUMNS} FROM tasks
+                 WHERE status = 'pending' AND due_day BETWEEN ? AND ?
+                 ORDER BY due_day ASC, id ASC""",
+    "recent_study": f"SELECT {STUDY_COLUMNS} FROM study_progress ORDER BY date_ts DESC LIMIT 20",
+    "recent_mocks": f"SELECT {MOCK_COLUMNS} FROM mock_scores ORDER BY date_ts DESC LIMIT ?",
+    "weak_subjects": """SELECT subject, total_clarity * 1.0 / sessions as avg_clarity, sessions
+                 FROM subject_stats
+                 WHERE sessions > 0
+                 ORDER BY avg_clarity ASC""",
+    "subject_stats": """SELECT subject, total_hours, sessions, last_studied FROM subject_stats
+                 ORDER BY subject ASC""",
+    "recent_clarity": """SELECT clarity_rating FROM study_progress
+                 WHERE subject = ? ORDER BY date DESC LIMIT ?""",
+    "subject_hours": """SELECT subject, total_hours FROM subject_stats
+                 WHERE sessions > 0
+                 ORDER BY subject ASC""",
+    # One round-trip for the Dashboard page and the sidebar Quick Stats. The
+    # first row carries the counts and the weakest subject; the rest are the
+    # top-N work/bar lists, tagged by their first column. The urgent set is
+    # kept separately by pa_urgent.
+    "dashboard_snapshot": f"""SELECT 'stats',
+                 (SELECT COUNT(*) FROM tasks WHERE status = 'pending'),
+                 (SELECT COUNT(*) FROM tasks WHERE category = 'Work' AND status = 'pending'),
+                 (SELECT COUNT(*) FROM tasks WHERE category = 'Bar Prep' AND status = 'pending'),
+                 (SELECT COALESCE(SUM(sessions), 0) FROM subject_stats),
+                 (SELECT subject FROM subject_stats WHERE sessions > 0
+                  ORDER BY total_clarity * 1.0 / sessions ASC LIMIT 1),
+                 NULL, NULL, NULL, NULL
+                 UNION ALL
+                 SELECT 'work', * FROM (SELECT {TASK_COLUMNS} FROM tasks
+                     WHERE category = 'Work' AND status = 'pending'
+                     ORDER BY due_day ASC, id ASC LIMIT :top_n)
+                 UNION ALL
+                 SELECT 'bar', * FROM (SELECT {TASK_COLUMNS} FROM tasks
+                     WHERE category = 'Bar Prep' AND status = 'pending'
+                     ORDER BY due_day ASC, id ASC LIMIT :top_n)""",
+    # Full dated history for pa_trends, in storage order (pa_trends sorts what
+    # needs sorting) and NULL-free so it loads straight into typed arrays.
+    "study_history": """SELECT subject, date_day, COALESCE(hours_spent, 0), COALESCE(clarity_rating, 0)
+                 FROM study_progress WHERE date_ts IS NOT NULL""",
+    "mock_history": """SELECT exam_type, date_ts, date_day, COALESCE(score, 0), COALESCE(total_points, 0)
+                 FROM mock_scores WHERE date_ts IS NOT NULL""",
+    # The events journal, in seq order from a consumer's offset; and the
+    # newest undoable events that no undo event lists yet. The unary + keeps
+    # that one off idx_events_action: it walks back from the newest event
+    # and stops after LIMIT matches instead of sorting every past action.
+    "events_after": """SELECT seq, ts, entity, action, payload FROM events
+                 WHERE seq > ? ORDER BY seq ASC LIMIT ?""",
+    "last_event": "SELECT COALESCE(MAX(seq), 0) FROM events",
+    "consumer_offset": "SELECT seq FROM consumer_offsets WHERE consumer = ?",
+    "undoable_events": f"""SELECT seq, entity, action, payload FROM events
+                 WHERE +action IN ({", ".join(f"'{action}'" for action in UNDO)})
+                 AND COALESCE(json_array_length(payload, '$.ids'), 1) > 0
+                 AND seq NOT IN (SELECT undone.value FROM events AS undo, json_each(undo.payload, '$.undoes') AS undone
+                                 WHERE undo.action = 'undo')
+                 ORDER BY seq DESC LIMIT ?""",
+    # Per-subject mock performance: every subject's trigger-kept totals, and
+    # one subject's latest scores through mock_subjects (newest mock first).
+    "mock_subject_stats": """SELECT subject, mocks, percentage / mocks FROM mock_subject_totals
+                 WHERE mocks > 0 ORDER BY subject ASC""",
+    "subject_mock_scores": """SELECT m.score * 100.0 / m.total_points
+                 FROM mock_subjects s JOIN mock_scores m ON m.id = s.mock_id
+                 WHERE s.subject = ? AND m.total_points > 0
+                 ORDER BY s.mock_id DESC LIMIT ?""",
+    # pa_archive: completed tasks past the cutoff, and the archive newest
+    # first, paged by keyset on (completed_ts, id).
+    "archivable_tasks": """SELECT id FROM tasks
+                 WHERE status = 'completed' AND completed_ts < ? LIMIT ?""",
+    "archived_tasks_older": f"""SELECT {TASK_COLUMNS}, completed_ts FROM tasks_archive
+                 WHERE (completed_ts, id) < (?, ?)
+                 ORDER BY completed_ts DESC, id DESC LIMIT ?""",
+    "archived_tasks_newer": f"""SELECT {TASK_COLUMNS}, completed_ts FROM tasks_archive
+                 WHERE (completed_ts, id) > (?, ?)
+                 ORDER BY completed_ts ASC, id ASC LIMIT ?""",
+    "completed_count": "SELECT value FROM task_counters WHERE name = 'completed'",
+    # analytics_summary(): sums of the per-day rollups over a day range.
+    "analytics_summary": """SELECT * FROM
+                 (SELECT TOTAL(sessions), TOTAL(hours), TOTAL(clarity) FROM study_daily
+                  WHERE day BETWEEN :start AND :end),
+                 (SELECT TOTAL(mocks), TOTAL(scored), TOTAL(percentage) FROM mock_daily
+                  WHERE day BETWEEN :start AND :end)""",
+    "completed_by_category": """SELECT category, SUM(completed) FROM task_daily
+                 WHERE day BETWEEN :start AND :end
+                 GROUP BY category HAVING SUM(completed) > 0
+                 ORDER BY category ASC""",
+    "last_maintenance": "SELECT MAX(ran_ts) FROM maintenance_log",
+    # pa_columnar's DuckDB mirror: a full copy in id order, batch by batch
+    "mirror_tasks": """SELECT id, category, task_type, priority, status, due_day, created_ts
+                 FROM tasks WHERE id > ? ORDER BY id LIMIT ?""",
+    "mirror_study_progress": """SELECT id, subject, date_ts, date_day, hours_spent, clarity_rating
+                 FROM study_progress WHERE id > ? ORDER BY id LIMIT ?""",
+    "mirror_mock_scores": """SELECT id, exam_type, date_ts, date_day, score, total_points
+                 FROM mock_scores WHERE id > ? ORDER BY id LIMIT ?""",
+    # The rows a batch of journal events touched, by id (a JSON array).
+    "mirror_tasks_ids": """SELECT id, category, task_type, priority, status, due_day, created_ts
+                 FROM tasks WHERE id IN (SELECT value FROM json_each(?))""",
+    "mirror_study_progress_ids": """SELECT id, subject, date_ts, date_day, hours_spent, clarity_rating
+                 FROM study_progress WHERE id IN (SELECT value FROM json_each(?))""",
+    "mirror_mock_scores_ids": """SELECT id, exam_type, date_ts, date_day, score, total_points
+                 FROM mock_scores WHERE id IN (SELECT value FROM json_each(?))""",
+    # The newest SEARCH_CANDIDATES matches (highest rowids, found by walking
+    # the doclist backwards) ranked by SEARCH_RANK; matches are wrapped in
+    # the HIGHLIGHT markers.
+    "search": """SELECT rowid, kind, day,
+                 highlight(search_index, 0, char(2), char(3)),
+                 snippet(search_index, 1, char(2), char(3), '…', 16)
+                 FROM search_index WHERE search_index MATCH ?
+                 AND rowid >= (SELECT MIN(rowid) FROM (SELECT rowid FROM search_index
+                               WHERE search_index MATCH ? ORDER BY rowid DESC LIMIT ?))
+                 ORDER BY rank LIMIT ? OFFSET ?""",
+}
+
+# Control characters that can't occur in typed text, replaced by the
+# renderer with real markup after escaping.
+HIGHLIGHT = ("\x02", "\x03")
+
+# Full scans and temp b-trees tools/check_query_plans.py accepts, by query:
+# the exact EXPLAIN QUERY PLAN line and why it is the intended plan. Any
+# other SCAN or temp b-tree fails the check, and so does an entry here that
+# its query's plan no longer contains.
+_SUBJECT_ROWS = "one row per subject, not per session"
+_NEWEST_FIRST = "walks the date index newest first and stops at the LIMIT"
+_WHOLE_HISTORY = ("pa_trends loads the whole dated history; a rowid-order scan beats "
+                  "walking an index with a row lookup each")
+_CHANGED_IDS = "json_each over the ids one batch of journal events touched"
+PLAN_EXEMPTIONS = {
+    "recent_study": {"SCAN study_progress USING INDEX idx_study_date_ts": _NEWEST_FIRST},
+    "recent_mocks": {"SCAN mock_scores USING INDEX idx_mock_date_ts": _NEWEST_FIRST},
+    "weak_subjects": {
+        "SCAN subject_stats": _SUBJECT_ROWS,
+        "USE TEMP B-TREE FOR ORDER BY": "orders by average clarity, which no index holds",
+    },
+    "subject_stats": {"SCAN subject_stats USING INDEX sqlite_autoindex_subject_stats_1": _SUBJECT_ROWS},
+    "subject_hours": {"SCAN subject_stats USING INDEX sqlite_autoindex_subject_stats_1": _SUBJECT_ROWS},
+    "dashboard_snapshot": {
+        "SCAN subject_stats": _SUBJECT_ROWS,
+        "USE TEMP B-TREE FOR ORDER BY": "the weakest subject orders by average clarity",
+    },
+    "study_history": {"SCAN study_progress": _WHOLE_HISTORY},
+    "mock_history": {"SCAN mock_scores": _WHOLE_HISTORY},
+    "undoable_events": {
+        "SCAN events": "walks back from the newest event and stops at the LIMIT",
+        "SCAN undone VIRTUAL TABLE INDEX 3:": "json_each over one undo event's payload",
+    },
+    "mock_subject_stats": {"SCAN mock_subject_totals USING INDEX sqlite_autoindex_mock_subject_totals_1":
+                           _SUBJECT_ROWS},
+    "completed_by_category": {"USE TEMP B-TREE FOR GROUP BY": "groups a day range of task_daily by category"},
+    "mirror_tasks_ids": {"SCAN json_each VIRTUAL TABLE INDEX 1:": _CHANGED_IDS},
+    "mirror_study_progress_ids": {"SCAN json_each VIRTUAL TABLE INDEX 1:": _CHANGED_IDS},
+    "mirror_mock_scores_ids": {"SCAN json_each VIRTUAL TABLE INDEX 1:": _CHANGED_IDS},
+    "search": {"SCAN search_index VIRTUAL TABLE INDEX 32:M4>": "an FTS5 MATCH above the candidates' lowest rowid",
+               "SCAN search_index VIRTUAL TABLE INDEX 192:M4": "an FTS5 MATCH walked newest first up to the LIMIT"},
+}
+
+TASK_CATEGORIES = {"work": "Work", "bar": "Bar Prep"}
+
+WORK_TASK_TYPES = [
+    "Work - Content Creation",
+    "Work - Class Management",
+    "Work - Team Reporting",
+]
+
+BAR_TASK_TYPES = [
+    "Bar Prep - Essay",
+    "Bar Prep - MBE",
+    "Bar Prep - Performance Test",
+]
+
+PRIORITIES = ["Low", "Medium", "High", "Urgent"]
+
+BAR_SUBJECTS = [
+    "Civil Procedure", "Constitutional Law", "Contracts",
+    "Criminal Law", "Criminal Procedure", "Torts",
+    "Property", "Evidence", "Business Organizations",
+    "Community Property", "Wills & Trusts", "Remedies",
+]
+
+MOCK_EXAM_TYPES = [
+    "Essay (Single)", "Essay (Multiple)",
+    "Performance Test", "MBE Section",
+    "Full MBE (200q)", "Full Practice Exam",
+]
+
+# Short forms of the bar subjects recognised by parse_subjects().
+SUBJECT_ALIASES = {
+    "Civ Pro": "Civil Procedure",
+    "Con Law": "Constitutional Law",
+    "Crim Law": "Criminal Law",
+    "Crim Pro": "Criminal Procedure",
+    "Business Associations": "Business Organizations",
+    "Corporations": "Business Organizations",
+    "Wills and Trusts": "Wills & Trusts",
+}
+_SUBJECT_NAMES = {name.lower(): subject for name, subject in
+                  [*((subject, subject) for subject in BAR_SUBJECTS), *SUBJECT_ALIASES.items()]}
+# Longest names first, so "Community Property" isn't read as "Property".
+_SUBJECT_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(name) for name in sorted(_SUBJECT_NAMES, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE)
+
+# ==================== WRITER ====================
+
+class WriteQueue:
+    """The one thread that writes to the database.
+
+    Callers enqueue statements and get a Future back. The writer drains the
+    queue into batches, runs each batch in a single transaction (one
+    savepoint per statement, so a failing statement only fails its own
+    future) and resolves the futures after COMMIT, i.e. once durable.
+    A statement's event is journaled in its savepoint, so it lands in
+    ``events`` exactly when the write does. After COMMIT each statement, in
+    order, invalidates the read cache and announces its event to
+    write_listeners, so listeners see exactly one generation step per write.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path, window_ms=GROUP_COMMIT_MS, batch_max=WRITE_BATCH_MAX):
+        self.path = path
+        self.window = window_ms / 1000
+        self.batch_max = batch_max
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="ai-pa-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=(), many=False, event=None):
+        """Queue one statement; the Future yields lastrowid (rowcount if ``many``).
+
+        ``sql`` may also be a function of the connection, for writes that
+        need several statements to land together; it runs in the
+        statement's savepoint and the Future yields its return value.
+        ``event`` is an optional (table, row) for the journal and
+        write_listeners; a single statement's row gets its "id" filled in
+        from lastrowid (a function may fill in its row itself) and every row
+        gets the "seq" of its journal entry.
+        """
+        future = Future()
+        self._queue.put((sql, params, many, event, future))
+        return future
+
+    def close(self):
+        """Commit everything already queued, then stop the thread."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.batch_max:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is self._STOP:
+                break
+        return batch
+
+    def _run(self):
+        # Listeners run here and look up per-database state by current_path().
+        use_path(self.path)
+        # Autocommit mode so BEGIN/SAVEPOINT/COMMIT are exactly the ones below.
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f"PRAGMA synchronous = {WRITER_SYNCHRONOUS}")
+        try:
+            while True:
+                batch = self._collect(self._queue.get())
+                stop = batch[-1] is self._STOP
+                if stop:
+                    batch.pop()
+                if batch:
+                    self._commit(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, many, event, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    if callable(sql):
+                        value = sql(conn)
+                    elif many:
+                        value = conn.executemany(sql, params).rowcount
+                    else:
+                        value = conn.execute(sql, params).lastrowid
+                    if event is not None and _changed_rows(event[1]):
+                        table, row = event
+                        if not many and not callable(sql):
+                            row.setdefault("id", value)
+                        row["seq"] = _journal(conn, table, row)
+                    results.append((future, value, None))
+                    conn.execute("RELEASE write")
+                except Exception as exc:
+                    # Any failure, not just SQLite's, fails only this future.
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    results.append((future, None, exc))
+            conn.execute("COMMIT")
+        except BaseException as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            query_cache.invalidate(self.path)
+            for item in batch:
+                item[-1].set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for (sql, params, many, event, _), (future, value, exc) in zip(batch, results):
+            if exc is None:
+                query_cache.invalidate(self.path)
+                if event is not None and "seq" in event[1]:
+                    _notify(*event)
+                future.set_result(value)
+            else:
+                future.set_exception(exc)
+
+# ==================== CONNECTION POOL ====================
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared by all sessions."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._writer = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool afterwards."""
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def ensure_schema(self):
+        """Create tables once per pool instead of once per call."""
+        if self._schema_ready:
+            return
+        with self._lock:
+            if self._schema_ready:
+                return
+            conn = self._connect()
+            try:
+                with conn:
+                    _create_schema(conn)
+                run_migrations(conn)
+            finally:
+                conn.close()
+            self._schema_ready = True
+
+    @property
+    def writer(self):
+        """This database's WriteQueue, started on first use."""
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = WriteQueue(self.path)
+        return self._writer
+
+    def close(self):
+        """Flush queued writes and close every idle connection."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._created -= 1
+            self._schema_ready = False
+
+
+def _create_schema(conn):
+    for ddl in SCHEMA + INDEXES + TRIGGERS:
+        conn.execute(ddl)
+    # Databases from before subject_stats existed: build it once from history.
+    empty = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM subject_stats)").fetchone()[0]
+    if empty:
+        conn.execute('''INSERT INTO subject_stats
+                     (subject, total_hours, total_clarity, sessions, last_studied)
+                     SELECT subject, COALESCE(SUM(hours_spent), 0), COALESCE(SUM(clarity_rating), 0),
+                            COUNT(*), MAX(date)
+                     FROM study_progress GROUP BY subject''')
+
+
+# ==================== USERS / SHARDS ====================
+
+# The database the current thread works on. Streamlit runs each session's
+# reruns on its own thread, so use_user() at the top of a rerun scopes every
+# data call in it; threads that never call it use DB_PATH.
+_local = threading.local()
+
+
+def shard_path(user_id):
+    """Database file for ``user_id``: a hash of the normalised id, fanned
+    out over 256 directories."""
+    digest = hashlib.sha256(user_id.strip().lower().encode("utf-8")).hexdigest()
+    return os.path.join(SHARD_DIR, digest[:2], f"{digest}.db")
+
+
+def current_path():
+    return getattr(_local, "path", None) or DB_PATH
+
+
+def use_path(path):
+    """Scope this thread's data calls to ``path`` (None: back to DB_PATH)."""
+    _local.path = path
+
+
+def use_user(user_id):
+    """Scope this thread's data calls to ``user_id``'s shard (None: DB_PATH)."""
+    use_path(shard_path(user_id) if user_id else None)
+
+
+@contextmanager
+def scoped(path):
+    """Temporarily run data calls against ``path`` (used by background workers)."""
+    previous = getattr(_local, "path", None)
+    use_path(path)
+    try:
+        yield
+    finally:
+        use_path(previous)
+
+
+_pools = OrderedDict()
+_pool_lock = threading.Lock()
+_pool_size = POOL_SIZE
+
+
+def get_pool():
+    """Return the current thread's pool, creating it and the schema on first use."""
+    path = current_path()
+    with _pool_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            if path != DB_PATH:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            pool = _pools[path] = ConnectionPool(path, _pool_size if path == DB_PATH else SHARD_POOL_SIZE)
+        _pools.move_to_end(path)
+        while len(_pools) > MAX_OPEN_SHARDS:
+            # A session still holding an evicted pool keeps working: the pool
+            # reconnects and restarts its writer on demand.
+            _pools.popitem(last=False)[1].close()
+    pool.ensure_schema()
+    return pool
+
+
+def configure(path, pool_size=POOL_SIZE):
+    """Point the data layer at another database file (tools, benchmarks)."""
+    global DB_PATH, _pool_size
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        DB_PATH = path
+        _pool_size = pool_size
+    query_cache.clear()
+    return get_pool()
+
+
+def init_db():
+    """Initialize database"""
+    return get_pool()
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+# SQLite reads any day 01-31 and rolls it into the next month
+# ('2024-02-30' is 2024-03-01); _parse_timestamp does the same.
+_ISO_DAY = re.compile(r"\d{4}-(?:0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])")
+
+
+def _naive(value):
+    # Aware values become naive UTC, as strftime('%s') applies the offset.
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _parse_timestamp(value):
+    """ISO date/timestamp string -> naive datetime, read as SQLite reads it."""
+    try:
+        return _naive(datetime.fromisoformat(value))
+    except ValueError:
+        match = _ISO_DAY.match(value)
+        if not match:
+            raise
+        first = datetime.fromisoformat(value[:8] + "01" + value[10:])
+        return _naive(first + timedelta(days=int(match.group(1)) - 1))
+
+
+def epoch_seconds(value):
+    """ISO timestamp (or datetime) -> seconds, matching strftime('%s')."""
+    value = _parse_timestamp(value) if isinstance(value, str) else _naive(value)
+    return int((value - _EPOCH).total_seconds())
+
+
+def epoch_day(value):
+    """ISO date/timestamp (or date) -> days since 1970-01-01, matching
+    strftime('%s') / 86400; None if unparseable."""
+    try:
+        if isinstance(value, datetime):
+            value = _naive(value).date()
+        elif not isinstance(value, date):
+            value = _parse_timestamp(str(value)).date()
+    except ValueError:
+        return None
+    return (value - _EPOCH.date()).days
+
+
+def _due_day(due_date):
+    day = epoch_day(due_date)
+    return NO_DUE_DAY if day is None else day
+
+
+# Called as query_hook(sql, seconds) after each statement when set;
+# pa_perf installs it to attribute SQL time to the current rerun.
+query_hook = None
+
+
+def _observe(sql, start):
+    if query_hook is not None:
+        query_hook(sql, time.perf_counter() - start)
+
+
+# Called on the writer thread as listener(table, row) after add_task/
+# complete_tasks/log_study/log_mock commit, with the inserted row as a dict
+# (completions pass "ids" and the new "status"); pa_scheduler and pa_urgent
+# stay current this way. Listeners must be quick and must not write.
+# Writes that changed nothing (an event listing no "ids", or an undo that
+# handled no "undoes") are neither journaled nor passed to listeners.
+write_listeners = []
+
+
+def _notify(table, row):
+    for listener in write_listeners:
+        try:
+            listener(table, row)
+        except Exception:
+            logger.exception("write listener %r failed", listener)
+
+
+def _changed_rows(row):
+    return all(row[key] for key in ("ids", "undoes") if key in row)
+
+
+def _journal(conn, table, row):
+    """Append ``row`` to the events journal; returns its seq."""
+    return conn.execute("INSERT INTO events (ts, entity, action, payload) VALUES (?, ?, ?, ?)",
+                        (epoch_seconds(datetime.now()), table, row.get("action", "write"),
+                         json.dumps(row, default=str))).lastrowid
+
+
+def _fetchall(sql, params=()):
+    start = time.perf_counter()
+    try:
+        with get_pool().connection() as conn:
+            return conn.execute(sql, params).fetchall()
+    finally:
+        _observe(sql, start)
+
+
+def submit_write(sql, params=(), many=False, event=None):
+    """Queue a write on the single writer; returns a Future that resolves
+    (to lastrowid, or rowcount if ``many``) once the write is committed."""
+    return get_pool().writer.submit(sql, params, many, event)
+
+
+def _execute(sql, params=(), event=None):
+    start = time.perf_counter()
+    try:
+        return submit_write(sql, params, event=event).result()
+    finally:
+        _observe(sql, start)
+
+def _executemany(sql, seq, event=None):
+    start = time.perf_counter()
+    try:
+        return submit_write(sql, list(seq), many=True, event=event).result()
+    finally:
+        _observe(sql, start)
+
+def _transact(fn, event=None):
+    """Run ``fn(conn)`` as one atomic write on the writer; returns its result."""
+    start = time.perf_counter()
+    try:
+        return submit_write(fn, event=event).result()
+    finally:
+        _observe(f"-- {fn.__name__}", start)
+
+# ==================== READ CACHE ====================
+
+class QueryCache:
+    """Bounded LRU of query results keyed by a per-database generation.
+
+    Every write to a database bumps that database's generation and drops
+    its stored entries, so reads between two writes are memory hits. A read
+    that raced a write is stored under the old generation and can never be
+    served. One user's writes never evict another user's entries.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._generations = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation_for(self, path):
+        with self._lock:
+            return self._generations.setdefault(path, 0)
+
+    @property
+    def generation(self):
+        """Generation of the current thread's database."""
+        return self.generation_for(current_path())
+
+    def get(self, key):
+        path = current_path()
+        with self._lock:
+            entry = (path, self._generations.get(path, 0), key)
+            try:
+                value = self._entries[entry]
+            except KeyError:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(entry)
+            self.hits += 1
+            return value, True
+
+    def put(self, generation, key, value):
+        path = current_path()
+        with self._lock:
+            if generation != self._generations.get(path, 0):
+                return
+            entry = (path, generation, key)
+            self._entries[entry] = value
+            self._entries.move_to_end(entry)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, path=None):
+        """Start a new generation for ``path`` (default: the current database)."""
+        path = current_path() if path is None else path
+        with self._lock:
+            self._generations[path] = self._generations.get(path, 0) + 1
+            for entry in [entry for entry in self._entries if entry[0] == path]:
+                del self._entries[entry]
+
+    def clear(self):
+        """Invalidate every database's entries."""
+        with self._lock:
+            for path in self._generations:
+                self._generations[path] += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "generation": self._generations.get(current_path(), 0),
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+query_cache = QueryCache()
+
+
+def cached_query(fn):
+    """Serve ``fn(*args)`` from query_cache until the next write.
+
+    Cached lists are shared between callers, so treat them as read-only.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        value, hit = query_cache.get(key)
+        if hit:
+            return value
+        generation = query_cache.generation
+        value = fn(*args, **kwargs)
+        query_cache.put(generation, key, value)
+        return value
+    return wrapper
+
+
+def cache_stats():
+    return query_cache.stats()
+
+# ==================== TASK FUNCTIONS ====================
+
+def add_task(title, description, task_type, due_date, priority):
+    category = "Work" if task_type.startswith("Work") else "Bar Prep"
+    now = datetime.now()
+    return _execute(f'''INSERT INTO tasks
+                 (id, title, description, category, task_type, due_date, priority, status, created_date,
+                  due_day, created_ts)
+                 VALUES ({NEXT_ID["tasks"]}, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+              (title, description, category, task_type, due_date, priority, 'pending', now.isoformat(),
+               _due_day(due_date), epoch_seconds(now)),
+              event=("tasks", {"action": "add_task", "title": title, "description": description,
+                               "category": category,
+                               "task_type": task_type, "due_date": due_date, "priority": priority,
+                               "status": "pending", "created_date": now.isoformat()}))
+
+@cached_query
+def get_all_tasks():
+    return _fetchall(QUERIES["pending_tasks"])
+
+@cached_query
+def get_tasks_by_type(task_type, limit=None, after=None, before=None):
+    """Pending tasks of one type in (due_day, id) order.
+
+    ``after``/``before`` are (due_day, id) keys of the neighbouring page's
+    last/first row; ``before`` pages are still returned in ascending order.
+    """
+    return [row[:-1] for row in _tasks_by_type(task_type, limit, after, before)]
+
+def _tasks_by_type(task_type, limit, after, before):
+    # Task rows followed by their stored due_day. Not cached itself: each
+    # caller caches its own result.
+    if task_type not in TASK_CATEGORIES:
+        return []
+    category = TASK_CATEGORIES[task_type]
+    limit = -1 if limit is None else limit
+    if after is not None:
+        return _fetchall(QUERIES["pending_tasks_by_category_after"], (category, *after, limit))
+    if before is not None:
+        rows = _fetchall(QUERIES["pending_tasks_by_category_before"], (category, *before, limit))
+        rows.reverse()
+        return rows
+    return _fetchall(QUERIES["pending_tasks_by_category"], (category, limit))
+
+@cached_query
+def get_task_page(task_type, page_size, after=None, before=None):
+    """One page of get_tasks_by_type plus the keys to reach its neighbours."""
+    rows = _tasks_by_type(task_type, page_size + 1, after, before)
+    more = len(rows) > page_size
+    if before is not None:
+        rows = rows[-page_size:]
+        has_prev, has_next = more, True
+    else:
+        rows = rows[:page_size]
+        has_prev, has_next = after is not None, more
+    # Keys come from the stored due_day the query orders by, never from
+    # re-parsing due_date, so a page always continues where this one ends.
+    return {
+        "rows": [row[:-1] for row in rows],
+        "has_prev": has_prev,
+        "has_next": has_next,
+        "first_key": (rows[0][-1], rows[0][0]) if rows else None,
+        "last_key": (rows[-1][-1], rows[-1][0]) if rows else None,
+    }
+
+def _urgent_window():
+    today = epoch_day(datetime.now().date())
+    return today, today + 3
+
+def get_urgent_tasks():
+    return _urgent_tasks(*_urgent_window())
+
+@cached_query
+def _urgent_tasks(start, end):
+    return _fetchall(QUERIES["urgent_tasks"], (start, end))
+
+def poll_urgent_tasks():
+    """get_urgent_tasks straight from the database: the read cache only
+    sees this process's writes, pa_urgent's poll has to see everyone's."""
+    return _fetchall(QUERIES["urgent_tasks"], _urgent_window())
+
+def complete_task(task_id):
+    complete_tasks([task_id])
+
+def complete_tasks(task_ids):
+    """Mark several tasks complete in one transaction; returns rows changed.
+    The event lists only the ids that were still pending."""
+    task_ids = list(task_ids)
+    row = {"action": "complete_tasks", "ids": [], "status": "completed"}
+    def complete_pending(conn):
+        if task_ids:
+            marks = ", ".join("?" * len(task_ids))
+            row["ids"] = [task_id for (task_id,) in conn.execute(
+                f"SELECT id FROM tasks WHERE id IN ({marks}) AND status = 'pending'", task_ids)]
+            conn.executemany("UPDATE tasks SET status = 'completed' WHERE id = ?",
+                             [(task_id,) for task_id in row["ids"]])
+        return len(row["ids"])
+    return _transact(complete_pending, event=("tasks", row))
+
+@cached_query
+def get_completed_count():
+    """Tasks ever completed, archived or not, from the trigger-kept counter."""
+    rows = _fetchall(QUERIES["completed_count"])
+    return rows[0][0] if rows else 0
+
+@cached_query
+def analytics_summary(start=None, end=None):
+    """Totals over study sessions, mocks and completed tasks dated between
+    ``start`` and ``end`` (dates, inclusive; None leaves that side open),
+    summed from the per-day rollups rather than the history tables."""
+    days = {"start": epoch_day(start) if start else NO_DUE_DAY,
+            "end": epoch_day(end) if end else 2 ** 62}
+    sessions, hours, clarity, mocks, scored, percentage = _fetchall(QUERIES["analytics_summary"], days)[0]
+    completed = dict(_fetchall(QUERIES["completed_by_category"], days))
+    return {
+        "sessions": int(sessions),
+        "total_hours": hours,
+        "avg_clarity": clarity / sessions if sessions else None,
+        "mock_count": int(mocks),
+        "mock_average": percentage / scored if scored else None,
+        "completed": completed,
+        "completed_total": sum(completed.values()),
+    }
+
+# ==================== ARCHIVE ====================
+
+def archive_tasks(cutoff_ts, batch_size=500):
+    """Move up to ``batch_size`` tasks completed before ``cutoff_ts`` into
+    tasks_archive in one transaction; returns how many moved."""
+    row = {"action": "archive_tasks", "status": "archived"}
+    def archive_batch(conn):
+        ids = row["ids"] = [task_id for (task_id,) in conn.execute(QUERIES["archivable_tasks"],
+                                                                   (cutoff_ts, batch_size))]
+        if ids:
+            marks = ", ".join("?" * len(ids))
+            conn.execute(f"""INSERT INTO tasks_archive ({ARCHIVE_COLUMNS})
+                         SELECT {TASK_COLUMNS}, due_day, created_ts, completed_ts, {_NOW_SECONDS}
+                         FROM tasks WHERE id IN ({marks})""", ids)
+            conn.execute(f"DELETE FROM tasks WHERE id IN ({marks})", ids)
+        return len(ids)
+    return _transact(archive_batch, event=("tasks", row))
+
+# ==================== JOURNAL ====================
+
+def get_events(after=0, limit=EVENT_BATCH):
+    """Up to ``limit`` journal events with seq > ``after``, oldest first, as
+    (seq, ts, entity, action, payload dict)."""
+    return [(seq, ts, entity, action, json.loads(payload))
+            for seq, ts, entity, action, payload in _fetchall(QUERIES["events_after"], (after, limit))]
+
+def get_last_event():
+    """The newest journal seq; 0 if nothing has been journaled yet."""
+    return _fetchall(QUERIES["last_event"])[0][0]
+
+def get_consumer_offset(consumer):
+    rows = _fetchall(QUERIES["consumer_offset"], (consumer,))
+    return rows[0][0] if rows else 0
+
+def set_consumer_offset(consumer, seq):
+    """Record that ``consumer`` has processed every event up to ``seq``;
+    an offset never moves backwards.
+
+    Written directly rather than through the writer queue: no cached read
+    depends on an offset, so storing one mustn't invalidate the query cache
+    (the mirror reads offsets on every sync).
+    """
+    with get_pool().connection() as conn:
+        with conn:
+            conn.execute("""INSERT INTO consumer_offsets (consumer, seq) VALUES (?, ?)
+                         ON CONFLICT(consumer) DO UPDATE SET seq = MAX(seq, excluded.seq)""", (consumer, seq))
+
+def undo(count=1):
+    """Revert the last ``count`` undoable actions that haven't been undone,
+    newest first, in one transaction, from their journal payloads.
+
+    An action whose rows have since changed (e.g. its task was archived) is
+    left as it is and skipped past, so it doesn't block older ones. Journals
+    an "undo" event listing every action handled under "undoes", the skipped
+    ones under "skipped" and, under "reverted", the ids changed per table.
+    Returns {"undone": seqs reverted, "skipped": why each skip happened}.
+    """
+    row = {"action": "undo", "undoes": [], "skipped": [], "reverted": {}}
+    reasons = []
+    def undo_actions(conn):
+        for seq, entity, action, payload in conn.execute(QUERIES["undoable_events"], (count,)).fetchall():
+            payload = json.loads(payload)
+            ids = payload["ids"] if "ids" in payload else [payload["id"]]
+            row["undoes"].append(seq)
+            conn.execute("SAVEPOINT undo_action")
+            changed = conn.executemany(UNDO[action], [(row_id,) for row_id in ids]).rowcount
+            if changed != len(ids):
+                # Never half an action: put back what did revert.
+                conn.execute("ROLLBACK TO undo_action")
+                row["skipped"].append(seq)
+                reasons.append(f"can't undo {action} (event {seq}): "
+                               f"{len(ids) - changed} of its rows have changed since")
+            else:
+                row["reverted"].setdefault(entity, []).extend(ids)
+            conn.execute("RELEASE undo_action")
+        return {"undone": [seq for seq in row["undoes"] if seq not in row["skipped"]], "skipped": reasons}
+    return _transact(undo_actions, event=("events", row))
+
+def get_archive_page(page_size, older=None, newer=None):
+    """One page of archived tasks, most recently completed first. Rows are
+    task rows plus completed_ts; keys are (completed_ts, id)."""
+    if newer is not None:
+        rows = _fetchall(QUERIES["archived_tasks_newer"], (*newer, page_size + 1))
+        more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_newer, has_older = more, True
+    else:
+        key = older if older is not None else (2 ** 62, 0)
+        rows = _fetchall(QUERIES["archived_tasks_older"], (*key, page_size + 1))
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        has_newer, has_older = older is not None, more
+    return {
+        "rows": rows,
+        "has_newer": has_newer,
+        "has_older": has_older,
+        "first_key": (rows[0][-1], rows[0][0]) if rows else None,
+        "last_key": (rows[-1][-1], rows[-1][0]) if rows else None,
+    }
+
+def run_maintenance(ran_ts, archived, started):
+    """Free the pages archiving left behind, refresh planner statistics and
+    log the run; returns the pages freed."""
+    def maintain(conn):
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            logger.warning("%s predates incremental auto-vacuum, so archiving frees no pages; "
+                           "run `python pa_archive.py --vacuum` once with the app stopped", current_path())
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # Each step frees one page, so the pragma has to be run to the end.
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute("PRAGMA optimize")
+        conn.execute("INSERT INTO maintenance_log VALUES (?, ?, ?, ?)",
+                     (ran_ts, archived, freed, time.perf_counter() - started))
+        return freed
+    return _transact(maintain)
+
+def get_last_maintenance():
+    """Epoch seconds of the last maintenance run, or None."""
+    return _fetchall(QUERIES["last_maintenance"])[0][0]
+
+@cached_query
+def get_dashboard_snapshot(top_n=5):
+    """Counts, top-N task lists and the weakest subject in one query."""
+    rows = _fetchall(QUERIES["dashboard_snapshot"], {"top_n": top_n})
+    stats = rows[0]
+    snapshot = {
+        "pending_count": stats[1],
+        "work_count": stats[2],
+        "bar_count": stats[3],
+        "session_count": stats[4],
+        "weakest_subject": stats[5],
+        "work": [],
+        "bar": [],
+    }
+    for row in rows[1:]:
+        snapshot[row[0]].append(row[1:])
+    return snapshot
+
+# ==================== SEARCH ====================
+
+_SEARCH_TOKEN = re.compile(r"\w+")
+
+
+def match_expression(text):
+    """Turn free text into a safe FTS5 query: every word must match and the
+    last one may be a prefix (search-as-you-type). None if nothing to search."""
+    tokens = _SEARCH_TOKEN.findall(text or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"' for token in tokens[:-1]) + f' "{tokens[-1]}"*'
+
+def search(text, page_size=20, offset=0):
+    """Ranked, highlighted matches across tasks, study notes and mock notes.
+
+    Rows are (kind, id, day, title, snippet) with HIGHLIGHT markers around
+    the matched terms. Only the newest SEARCH_CANDIDATES matches are ranked;
+    "capped" is set on the last page when there may be older ones.
+    """
+    match = match_expression(text)
+    rows = _search(match, page_size + 1, offset) if match else []
+    has_next = len(rows) > page_size
+    return {
+        "rows": rows[:page_size],
+        "offset": offset,
+        "has_prev": offset > 0,
+        "has_next": has_next,
+        "capped": not has_next and offset + len(rows) >= SEARCH_CANDIDATES,
+    }
+
+@cached_query
+def _search(match, limit, offset):
+    return [(kind, rowid // SEARCH_STRIDE, day, title, snippet)
+            for rowid, kind, day, title, snippet in _fetchall(
+                QUERIES["search"], (match, match, SEARCH_CANDIDATES, limit, offset))]
+
+# ==================== STUDY FUNCTIONS ====================
+
+def log_study(subject, hours, clarity, notes):
+    now = datetime.now()
+    return _execute('''INSERT INTO study_progress
+                 (subject, date, hours_spent, clarity_rating, notes, date_ts, date_day)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
+              (subject, now.isoformat(), hours, clarity, notes, epoch_seconds(now), epoch_day(now)),
+              event=("study_progress", {"action": "log_study", "subject": subject, "date": now.isoformat(),
+                                        "hours_spent": hours, "clarity_rating": clarity, "notes": notes}))
+
+def parse_subjects(text):
+    """Bar subjects named in ``text`` (full names or SUBJECT_ALIASES, any
+    case), each once, in BAR_SUBJECTS order."""
+    named = {_SUBJECT_NAMES[match.lower()] for match in _SUBJECT_PATTERN.findall(text or "")}
+    return [subject for subject in BAR_SUBJECTS if subject in named]
+
+def log_mock(exam_type, score, total, notes, subjects=""):
+    """Log a mock score tagged with the subjects ``subjects`` names, or
+    those ``notes`` names if it names none."""
+    now = datetime.now()
+    tagged = parse_subjects(subjects) or parse_subjects(notes)
+    row = {"action": "log_mock", "exam_type": exam_type, "score": score, "total_points": total,
+           "date": now.isoformat(), "notes": notes, "subjects": tagged}
+    def insert_mock(conn):
+        mock_id = row["id"] = conn.execute('''INSERT INTO mock_scores
+                 (exam_type, score, total_points, date, notes, date_ts, date_day)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)''',
+              (exam_type, score, total, now.isoformat(), notes, epoch_seconds(now), epoch_day(now))).lastrowid
+        conn.executemany("INSERT INTO mock_subjects (subject, mock_id) VALUES (?, ?)",
+                         [(subject, mock_id) for subject in tagged])
+        return mock_id
+    return _transact(insert_mock, event=("mock_scores", row))
+
+@cached_query
+def get_study_progress():
+    return _fetchall(QUERIES["recent_study"])
+
+@cached_query
+def get_mock_scores(limit=10):
+    return _fetchall(QUERIES["recent_mocks"], (limit,))
+
+@cached_query
+def get_mock_subject_stats():
+    """(subject, mocks, average %) for every subject tagged on a scored mock."""
+    return _fetchall(QUERIES["mock_subject_stats"])
+
+def get_study_history():
+    """Every dated session as (subject, day, hours, clarity); see pa_trends."""
+    return _fetchall(QUERIES["study_history"])
+
+def get_mock_history():
+    """Every dated mock as (exam_type, ts, day, score, total); see pa_trends."""
+    return _fetchall(QUERIES["mock_history"])
+
+def get_mirror_rows(table, after, limit=MIRROR_BATCH):
+    """Up to ``limit`` rows of ``table`` with id > ``after``; see pa_columnar."""
+    return _fetchall(QUERIES["mirror_" + table], (after, limit))
+
+def get_mirror_rows_by_id(table, ids):
+    """The rows of ``table`` still present among ``ids``; see pa_columnar."""
+    return _fetchall(QUERIES[f"mirror_{table}_ids"], (json.dumps(list(ids)),))
+
+@cached_query
+def get_weak_subjects():
+    return _fetchall(QUERIES["weak_subjects"])
+
+def get_study_snapshot(subjects, clarity_limit=10, mock_limit=10):
+    """Everything pa_scheduler rebuilds from, read in one transaction so it
+    matches the journal: (last seq, subject_stats rows, {subject: latest
+    clarity ratings}, {subject: latest mock percentages}), newest first."""
+    start = time.perf_counter()
+    try:
+        with get_pool().connection() as conn:
+            conn.execute("BEGIN")
+            try:
+                seq = conn.execute(QUERIES["last_event"]).fetchone()[0]
+                stats = conn.execute(QUERIES["subject_stats"]).fetchall()
+                clarity = {subject: [row[0] for row in conn.execute(QUERIES["recent_clarity"],
+                                                                    (subject, clarity_limit))]
+                           for subject, *_ in stats}
+                mocks = {subject: [row[0] for row in conn.execute(QUERIES["subject_mock_scores"],
+                                                                  (subject, mock_limit))]
+                         for subject in subjects}
+            finally:
+                conn.execute("COMMIT")
+            return seq, stats, clarity, mocks
+    finally:
+        _observe("-- get_study_snapshot", start)
+
+@cached_query
+def get_subject_hours():
+    """Total hours per subject, from the trigger-maintained subject_stats."""
+    return _fetchall(QUERIES["subject_hours"])
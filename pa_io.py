@@ -0,0 +1,266 @@
+"""Streaming bulk import/export for tasks, study sessions and mock scores.
+
+Rows flow through generators end to end: imports validate one row at a time
+and insert in chunked ``executemany`` writes on the app's writer, exports
+stream the cursor straight to disk, so memory stays flat for files of any
+size.
+
+    python pa_io.py export tasks tasks.csv
+    python pa_io.py import study_progress history.jsonl
+"""
+
+import argparse
+import csv
+import json
+import sys
+from datetime import date, datetime
+from itertools import islice
+
+import pa_db
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+STATUSES = ("pending", "completed")
+
+# ==================== VALIDATION ====================
+
+def _text(value, required=False):
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError("is required")
+    return value
+
+
+def _day(value):
+    value = _text(value, required=True)
+    return date.fromisoformat(value[:10]).isoformat()
+
+
+def _timestamp(value, default=None):
+    value = _text(value)
+    if not value:
+        if default is None:
+            raise ValueError("is required")
+        return default
+    value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        # Stored timestamps are naive local time, like everything the app
+        # writes with datetime.now(); keep the instant, in local time.
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat()
+
+
+def _number(value, cast, low=None, high=None):
+    value = _text(value, required=True)
+    number = float(value)
+    if cast is int:
+        if not number.is_integer():
+            raise ValueError("must be a whole number")
+        number = int(number)
+    if (low is not None and number < low) or (high is not None and number > high):
+        raise ValueError(f"must be between {low} and {high}")
+    return number
+
+
+def _choice(value, choices, default):
+    value = _text(value) or default
+    if value not in choices:
+        raise ValueError(f"must be one of {', '.join(choices)}")
+    return value
+
+
+def _task(row):
+    task_type = _text(row.get("task_type"), required=True)
+    due_date = _day(row.get("due_date"))
+    status = _choice(row.get("status"), STATUSES, "pending")
+    # A task imported as completed is dated from its due and created dates
+    # (see pa_db._INSERTED_COMPLETION), so it doesn't get "created now".
+    created = due_date if status == "completed" else datetime.now().isoformat()
+    return (
+        _text(row.get("title"), required=True),
+        _text(row.get("description")),
+        _text(row.get("category")) or ("Work" if task_type.startswith("Work") else "Bar Prep"),
+        task_type,
+        due_date,
+        _choice(row.get("priority"), pa_db.PRIORITIES, "Medium"),
+        status,
+        _timestamp(row.get("created_date"), default=created),
+    )
+
+
+def _study(row):
+    return (
+        _text(row.get("subject"), required=True),
+        _timestamp(row.get("date")),
+        _number(row.get("hours_spent"), float, 0, 24),
+        _number(row.get("clarity_rating"), int, 1, 5),
+        _text(row.get("notes")),
+    )
+
+
+def _mock(row):
+    total = _number(row.get("total_points"), int, 1)
+    return (
+        _text(row.get("exam_type"), required=True),
+        _number(row.get("score"), int, 0, total),
+        total,
+        _timestamp(row.get("date")),
+        _text(row.get("notes")),
+    )
+
+
+# Columns written on import (ids are always assigned, see pa_db.NEXT_ID) and
+# the validator that turns a raw record into that tuple.
+TABLES = {
+    "tasks": (("title", "description", "category", "task_type", "due_date",
+               "priority", "status", "created_date"), _task),
+    "study_progress": (("subject", "date", "hours_spent", "clarity_rating", "notes"), _study),
+    "mock_scores": (("exam_type", "score", "total_points", "date", "notes"), _mock),
+}
+
+# ==================== READERS / WRITERS ====================
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError(f"cannot tell the format of {path!r}; pass csv or jsonl")
+
+
+def read_records(fh, fmt):
+    """Yield (line_number, dict) pairs without loading the file.
+
+    Lines that are not valid JSON are yielded as the parse error so the
+    importer can report them alongside validation failures.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as exc:
+                yield line_number, exc
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# ==================== IMPORT / EXPORT ====================
+
+def import_file(table, path, fmt=None, chunk_size=CHUNK_SIZE, strict=False):
+    """Validate and insert every record of ``path`` into ``table``.
+
+    Invalid records are skipped and reported (or raise with ``strict``).
+    Returns a dict with inserted/skipped counts and the first errors.
+    """
+    columns, validate = TABLES[table]
+    report = {"table": table, "inserted": 0, "skipped": 0, "errors": []}
+    sql = (f"INSERT INTO {table} (id, {', '.join(columns)}) "
+           f"VALUES ({pa_db.NEXT_ID[table]}, {', '.join('?' * len(columns))})")
+
+    def valid_rows(records):
+        for line_number, record in records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                yield validate(record)
+            except (ValueError, TypeError, AttributeError) as exc:
+                if strict:
+                    raise ValueError(f"{path}:{line_number}: {exc}") from exc
+                report["skipped"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append(f"line {line_number}: {exc}")
+
+    def insert(chunk):
+        # Each chunk is one write on the app's writer, so it is journaled as
+        # an "import" event naming the ids it added and invalidates the read
+        # cache like any other write.
+        row = {"action": "import", "count": len(chunk)}
+        def import_chunk(conn):
+            first_id = row["first_id"] = conn.execute(f"SELECT {pa_db.NEXT_ID[table]}").fetchone()[0]
+            conn.executemany(sql, chunk)
+            last_id = row["last_id"] = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+            if table == "mock_scores":
+                # Tagged with the subjects their notes name, as log_mock
+                # does when no subjects are given.
+                pa_db.tag_mocks_from_notes(conn, first_id - 1, last_id)
+        pa_db.submit_write(import_chunk, event=(table, row)).result()
+
+    fmt = detect_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as fh:
+        for chunk in _chunks(valid_rows(read_records(fh, fmt)), chunk_size):
+            insert(chunk)
+            report["inserted"] += len(chunk)
+    return report
+
+
+def export_file(table, path, fmt=None, chunk_size=CHUNK_SIZE):
+    """Stream every row of ``table`` to ``path``; returns the row count."""
+    if table not in TABLES:
+        raise ValueError(f"unknown table {table!r}")
+    fmt = detect_format(path, fmt)
+    count = 0
+    with pa_db.get_pool().connection() as conn, open(path, "w", newline="", encoding="utf-8") as fh:
+        # Only the portable columns; the integer date twins are derived data.
+        columns = ("id",) + TABLES[table][0]
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+        header = [col[0] for col in cursor.description]
+        writer = csv.writer(fh) if fmt == "csv" else None
+        if writer:
+            writer.writerow(header)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                fh.writelines(json.dumps(dict(zip(header, row)), ensure_ascii=False) + "\n" for row in rows)
+            count += len(rows)
+    return count
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export for Kriti's PA Agent")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--db", help="database file (default: ai_pa.db or $AI_PA_DB)")
+    parser.add_argument("--user", help="multi-user mode: work on this user's shard instead")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--strict", action="store_true", help="stop at the first invalid record")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        pa_db.configure(args.db)
+    if args.user:
+        pa_db.use_user(args.user)
+    if args.action == "export":
+        count = export_file(args.table, args.path, args.format, args.chunk_size)
+        print(f"exported {count} rows from {args.table} to {args.path}")
+        return 0
+    report = import_file(args.table, args.path, args.format, args.chunk_size, args.strict)
+    print(f"imported {report['inserted']} rows into {args.table}, skipped {report['skipped']}")
+    for error in report["errors"]:
+        print(f"  {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
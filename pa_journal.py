@@ -0,0 +1,123 @@
+"""Consumers of the append-only events journal.
+
+Every app write (add_task, complete_tasks, log_study, log_mock, archiving
+and undo) appends one event to ``events`` in the same transaction as the
+write, numbered by an increasing ``seq`` and carrying the written row as
+JSON. A consumer keeps the seq it has processed up to in
+``consumer_offsets`` and each poll hands it only the events after that, so
+a job that mirrors or exports changes never rescans the tables (pa_columnar
+keeps its DuckDB mirror current this way). Offsets are stored after the
+handler returns, straight to the database rather than through the writer,
+so they don't invalidate the query cache: a consumer that crashes mid-batch
+sees that batch again (at-least-once).
+
+A pa_io import journals one "import" event per chunk, naming the
+``first_id`` and ``last_id`` it added rather than every row. gen_synthetic
+writes straight to the tables and is not journaled. An undo event lists
+the ids it reverted per table under "reverted".
+
+    python pa_journal.py tail [--after SEQ]
+    python pa_journal.py export changes.jsonl [--consumer export]
+    python pa_journal.py undo [--count N]
+"""
+
+import argparse
+import json
+import sys
+
+import pa_db
+
+
+class EventConsumer:
+    """Reads the journal from the offset stored under ``name``."""
+
+    def __init__(self, name, batch_size=pa_db.EVENT_BATCH):
+        self.name = name
+        self.batch_size = batch_size
+
+    @property
+    def offset(self):
+        return pa_db.get_consumer_offset(self.name)
+
+    def poll(self, handler):
+        """Pass the next batch of new events to ``handler(events)``, then
+        store the offset; returns how many events were handled."""
+        events = pa_db.get_events(self.offset, self.batch_size)
+        if events:
+            handler(events)
+            pa_db.set_consumer_offset(self.name, events[-1][0])
+        return len(events)
+
+    def drain(self, handler):
+        """Poll until caught up; returns how many events were handled."""
+        handled = 0
+        while True:
+            count = self.poll(handler)
+            handled += count
+            if count < self.batch_size:
+                return handled
+
+
+def event_record(event):
+    seq, ts, entity, action, payload = event
+    return {"seq": seq, "ts": ts, "entity": entity, "action": action, "payload": payload}
+
+
+def export_events(path, consumer="export"):
+    """Append every event ``consumer`` hasn't exported yet to the JSONL file
+    ``path``; returns how many were written."""
+    def write(events):
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(event_record(event), ensure_ascii=False) + "\n" for event in events)
+    return EventConsumer(consumer).drain(write)
+
+
+def tail(after=0, batch_size=pa_db.EVENT_BATCH):
+    """Yield every event after seq ``after`` without storing an offset."""
+    while True:
+        events = pa_db.get_events(after, batch_size)
+        yield from events
+        if len(events) < batch_size:
+            return
+        after = events[-1][0]
+
+# ==================== CLI ====================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read, export and undo from the events journal.")
+    parser.add_argument("--db", help="database file (default: ai_pa.db or $AI_PA_DB)")
+    parser.add_argument("--user", help="multi-user mode: use this user's shard instead")
+    commands = parser.add_subparsers(dest="command", required=True)
+    tail_parser = commands.add_parser("tail", help="print events as JSON lines")
+    tail_parser.add_argument("--after", type=int, default=0, help="only events after this seq")
+    export_parser = commands.add_parser("export", help="append new events to a JSONL file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--consumer", default="export", help="name the offset is stored under")
+    undo_parser = commands.add_parser("undo", help="undo the last actions")
+    undo_parser.add_argument("--count", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.db:
+        pa_db.configure(args.db)
+    if args.user:
+        pa_db.use_user(args.user)
+    pa_db.init_db()
+    try:
+        if args.command == "tail":
+            for event in tail(args.after):
+                print(json.dumps(event_record(event), ensure_ascii=False))
+        elif args.command == "export":
+            print(f"exported {export_events(args.path, args.consumer)} events to {args.path}")
+        else:
+            result = pa_db.undo(args.count)
+            undone = result["undone"]
+            for reason in result["skipped"]:
+                print(f"skipped: {reason}", file=sys.stderr)
+            print(f"undid {len(undone)} actions" + (f" (events {', '.join(map(str, undone))})" if undone else ""))
+    finally:
+        pa_db.get_pool().close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
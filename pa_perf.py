@@ -0,0 +1,134 @@
+"""Optional per-rerun performance instrumentation.
+
+Turned on with ``AI_PA_PERF=1`` or the ``?perf=1`` query parameter. Each
+rerun records wall time per section (CSS, header, page body, sidebar), the
+number of SQL statements and their total time, shows them in a collapsible
+sidebar panel and appends one JSON line to a rotating log.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import pa_db
+
+LOG_PATH = os.environ.get("AI_PA_PERF_LOG", "perf_log.jsonl")
+LOG_MAX_BYTES = int(os.environ.get("AI_PA_PERF_LOG_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUPS = 3
+SLOWEST_QUERIES = 3
+
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def enabled(query_params=None):
+    if os.environ.get("AI_PA_PERF", "").lower() in ("1", "true", "yes"):
+        return True
+    value = (query_params or {}).get("perf")
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value in ("1", "true", "yes")
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                logger = logging.getLogger("ai_pa.perf")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES,
+                                              backupCount=LOG_BACKUPS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+
+def _record_query(sql, seconds):
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.queries.append((seconds, " ".join(sql.split())))
+
+
+pa_db.query_hook = _record_query
+
+# ==================== PROFILERS ====================
+
+class RerunProfiler:
+    """Splits one rerun into consecutive named sections with mark()."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sections = {}
+        self.queries = []
+        self._current = None
+        self._current_start = self.started
+        _local.profiler = self
+
+    def mark(self, name):
+        """End the running section (if any) and start ``name``."""
+        now = time.perf_counter()
+        if self._current is not None:
+            self.sections[self._current] = self.sections.get(self._current, 0.0) + (now - self._current_start) * 1000
+        self._current = name
+        self._current_start = now
+
+    def finish(self, page=None):
+        """Close the last section, detach from the thread and log the rerun."""
+        self.mark(None)
+        _local.profiler = None
+        slowest = sorted(self.queries, reverse=True)[:SLOWEST_QUERIES]
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "page": page,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "sections_ms": {name: round(ms, 3) for name, ms in self.sections.items()},
+            "queries": len(self.queries),
+            "sql_ms": round(sum(seconds for seconds, _ in self.queries) * 1000, 3),
+            "slowest": [{"ms": round(seconds * 1000, 3), "sql": sql[:120]} for seconds, sql in slowest],
+            "cache": pa_db.cache_stats(),
+        }
+        _get_logger().info(json.dumps(record, ensure_ascii=False))
+        return record
+
+
+class NullProfiler:
+    """Stand-in used when instrumentation is off; every call is a no-op."""
+
+    def mark(self, name):
+        pass
+
+    def finish(self, page=None):
+        return None
+
+
+def start_rerun(is_enabled):
+    # A rerun interrupted by st.rerun()/st.stop() never reaches finish();
+    # starting a new profiler simply replaces its thread-local slot.
+    if is_enabled:
+        return RerunProfiler()
+    _local.profiler = None
+    return NullProfiler()
+
+
+def render_panel(record):
+    """Collapsible sidebar panel for one finished rerun."""
+    if record is None:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("🛠️ Performance (this rerun)"):
+        st.write(f"**Total:** {record['total_ms']:.1f} ms")
+        st.write(f"**SQL:** {record['queries']} queries, {record['sql_ms']:.1f} ms")
+        st.bar_chart(record["sections_ms"])
+        for query in record["slowest"]:
+            st.caption(f"{query['ms']:.2f} ms · {query['sql']}")
+        cache = record["cache"]
+        st.caption(f"Cache: {cache['hits']} hits / {cache['misses']} misses (process-wide)")
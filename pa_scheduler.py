@@ -0,0 +1,212 @@
+"""Heap-based "study next" scheduler for the bar subjects.
+
+Every subject gets a due time: when it was last studied plus an interval
+that grows with its decay-weighted clarity, the hours already put in and
+linked mock performance. Due times don't move as the clock does, so the
+subjects sit in a heap keyed on them; logging a session or a mock re-pushes
+one entry (O(log n)) and the most overdue subjects are always on top.
+"""
+
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pa_db
+
+BASE_INTERVAL_DAYS = 3.0
+# Weight of the newest observation in the decay-weighted averages.
+CLARITY_DECAY = 0.3
+MOCK_DECAY = 0.3
+CLARITY_HISTORY = 10
+MOCK_HISTORY = 10
+NEUTRAL_CLARITY = 3.0
+NEUTRAL_MOCK = 70.0
+DAY = 86400
+
+
+def _now():
+    # Same naive-local-as-UTC encoding as the stored date_ts columns.
+    return pa_db.epoch_seconds(datetime.now())
+
+
+def _decay(average, value, weight):
+    return value if average is None else weight * value + (1 - weight) * average
+
+
+def interval_days(clarity, hours, mock_pct):
+    """Days a subject can rest after a session before it is due again."""
+    clarity_factor = (clarity / NEUTRAL_CLARITY) ** 2
+    hours_factor = 1 + math.log1p(hours) / 4
+    mock_factor = min(1.5, max(0.5, mock_pct / NEUTRAL_MOCK))
+    return BASE_INTERVAL_DAYS * clarity_factor * hours_factor * mock_factor
+
+
+class SubjectState:
+    """What the model knows about one subject."""
+
+    def __init__(self, subject):
+        self.subject = subject
+        self.clarity = None
+        self.mock_pct = None
+        self.hours = 0.0
+        self.last_studied = None
+
+    @property
+    def due(self):
+        """Epoch seconds at which the subject is due; never-studied is due at once."""
+        if self.last_studied is None:
+            return 0
+        return self.last_studied + DAY * interval_days(
+            self.clarity or NEUTRAL_CLARITY, self.hours,
+            NEUTRAL_MOCK if self.mock_pct is None else self.mock_pct)
+
+
+class StudyScheduler:
+    """Subjects ordered by due time in a heap with lazy deletion.
+
+    An update pushes a fresh entry and bumps the subject's version; stale
+    entries are skipped when they surface and compacted away in bulk.
+    """
+
+    def __init__(self, subjects):
+        self.subjects = list(subjects)
+        # Cache generation the state matches and the last journal seq it
+        # includes; None until loaded.
+        self.generation = None
+        self.seq = None
+        self._states = {}
+        self._versions = {}
+        self._heap = []
+        self._lock = threading.RLock()
+
+    def _push(self, state):
+        version = self._versions.get(state.subject, 0) + 1
+        self._versions[state.subject] = version
+        heapq.heappush(self._heap, (state.due, state.subject, version))
+        if len(self._heap) > 2 * len(self._states) + 16:
+            self._heap = [entry for entry in self._heap if self._versions[entry[1]] == entry[2]]
+            heapq.heapify(self._heap)
+
+    def _state(self, subject):
+        if subject not in self._states:
+            self._states[subject] = SubjectState(subject)
+        return self._states[subject]
+
+    def load(self):
+        """Rebuild every subject from subject_stats, recent clarity and
+        recent mocks tagged with it."""
+        with self._lock:
+            generation = pa_db.query_cache.generation
+            seq, stats, clarity, mocks = pa_db.get_study_snapshot(self.subjects, CLARITY_HISTORY, MOCK_HISTORY)
+            self._states, self._versions, self._heap = {}, {}, []
+            for subject in self.subjects:
+                self._state(subject)
+            for subject, hours, sessions, last_studied in stats:
+                state = self._state(subject)
+                state.hours = hours or 0.0
+                state.last_studied = pa_db.epoch_seconds(last_studied) if last_studied else None
+                for rating in reversed(clarity[subject]):
+                    state.clarity = _decay(state.clarity, rating, CLARITY_DECAY)
+            for subject in self.subjects:
+                state = self._state(subject)
+                for percentage in reversed(mocks[subject]):
+                    state.mock_pct = _decay(state.mock_pct, percentage, MOCK_DECAY)
+            for state in self._states.values():
+                self._push(state)
+            self.generation, self.seq = generation, seq
+
+    def record_study(self, subject, hours, clarity, when):
+        with self._lock:
+            state = self._state(subject)
+            state.hours += hours or 0.0
+            state.clarity = _decay(state.clarity, clarity, CLARITY_DECAY)
+            state.last_studied = max(state.last_studied or 0, when)
+            self._push(state)
+
+    def record_mock(self, subjects, percentage):
+        with self._lock:
+            for subject in subjects:
+                state = self._state(subject)
+                state.mock_pct = _decay(state.mock_pct, percentage, MOCK_DECAY)
+                self._push(state)
+
+    def plan(self, limit=5, now=None):
+        """The ``limit`` most overdue subjects as (subject, due_in_days,
+        clarity, hours, mock_pct); negative due_in_days means overdue."""
+        now = _now() if now is None else now
+        with self._lock:
+            taken = []
+            while self._heap and len(taken) < limit:
+                entry = heapq.heappop(self._heap)
+                if self._versions[entry[1]] == entry[2]:
+                    taken.append(entry)
+            for entry in taken:
+                heapq.heappush(self._heap, entry)
+            plan = []
+            for due, subject, version in taken:
+                state = self._states[subject]
+                due_in = None if state.last_studied is None else (due - now) / DAY
+                plan.append((subject, due_in, state.clarity, state.hours, state.mock_pct))
+            return plan
+
+    def on_write(self, table, row):
+        """pa_db write listener: apply the row if nothing else was missed."""
+        with self._lock:
+            generation = pa_db.query_cache.generation
+            if self.seq is not None and row["seq"] <= self.seq:
+                # Committed before load() read its snapshot, so already
+                # counted; only its generation step is new.
+                if self.generation == generation - 1:
+                    self.generation = generation
+                return
+            if self.generation != generation - 1:
+                # Another write (e.g. from another process) happened since the
+                # last sync; study_plan() rebuilds on its next call.
+                return
+            if row.get("action") in ("undo", "import"):
+                # Reverted rows can't be taken back out of the decayed
+                # averages, and an import only names an id range; leave the
+                # state stale so it is rebuilt.
+                return
+            if table == "study_progress":
+                self.record_study(row["subject"], row["hours_spent"], row["clarity_rating"],
+                                  pa_db.epoch_seconds(row["date"]))
+            elif table == "mock_scores" and row.get("subjects") and row["total_points"]:
+                self.record_mock(row["subjects"], row["score"] / row["total_points"] * 100)
+            self.generation = generation
+
+
+# One scheduler per database (i.e. per user in multi-user mode), least
+# recently used dropped beyond pa_db.MAX_OPEN_SHARDS.
+_schedulers = OrderedDict()
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The current database's scheduler."""
+    path = pa_db.current_path()
+    with _schedulers_lock:
+        if path not in _schedulers:
+            _schedulers[path] = StudyScheduler(pa_db.BAR_SUBJECTS)
+        _schedulers.move_to_end(path)
+        while len(_schedulers) > pa_db.MAX_OPEN_SHARDS:
+            _schedulers.popitem(last=False)
+        return _schedulers[path]
+
+
+def _on_write(table, row):
+    # Runs on the writer thread, which is scoped to the written database.
+    get_scheduler().on_write(table, row)
+
+
+pa_db.write_listeners.append(_on_write)
+
+
+def study_plan(limit=5):
+    """Ranked "study next" subjects, rebuilding only after unseen writes."""
+    scheduler = get_scheduler()
+    if scheduler.generation != pa_db.query_cache.generation:
+        scheduler.load()
+    return scheduler.plan(limit)
@@ -0,0 +1,163 @@
+"""Vectorised trend engine behind the Analytics page.
+
+The whole study and mock history is loaded (one query per table) into NumPy
+arrays and every series is computed with array operations: daily and weekly
+buckets via ``bincount``, rolling means via cumulative sums, and a
+least-squares trend line for mock percentages. Results go through pa_db's
+read cache, so they are recomputed only after a write. With the DuckDB
+mirror enabled (pa_columnar) the history arrives as columns directly.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+import pa_columnar
+import pa_db
+
+CLARITY_WINDOW_DAYS = 14
+MOCK_WINDOW = 5
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def to_dates(days):
+    """Epoch-day integers -> datetime64[D], which charts treat as time."""
+    return _EPOCH + np.asarray(days, dtype="i8").astype("timedelta64[D]")
+
+
+def load_columns(rows, names, dtypes):
+    """Rows -> {name: array}. The first column is text and is coded as
+    integers, with its sorted labels under ``"labels"``."""
+    columns = list(zip(*rows)) or [()] * len(names)
+    codes = {}
+    for label in sorted(set(columns[0])):
+        codes[label] = len(codes)
+    data = {"labels": list(codes),
+            names[0]: np.fromiter(map(codes.__getitem__, columns[0]), "i8", len(columns[0]))}
+    for name, dtype, column in zip(names[1:], dtypes, columns[1:]):
+        data[name] = np.fromiter(column, dtype, len(column))
+    return data
+
+# ==================== ARRAY HELPERS ====================
+
+def bucket_sums(index, weights, size):
+    """Sum ``weights`` into ``size`` buckets by integer ``index``."""
+    return np.bincount(index, weights=weights, minlength=size)[:size]
+
+
+def rolling_mean(sums, counts, window):
+    """Trailing ``window``-bucket mean along the last axis.
+
+    ``sums``/``counts`` are per-bucket totals, so the mean is weighted by
+    observations, not buckets. Windows without observations are NaN.
+    """
+    zeros = np.zeros(sums.shape[:-1] + (1,))
+    sum_cs = np.concatenate([zeros, np.cumsum(sums, axis=-1)], axis=-1)
+    count_cs = np.concatenate([zeros, np.cumsum(counts, axis=-1)], axis=-1)
+    high = np.arange(1, sums.shape[-1] + 1)
+    low = np.maximum(high - window, 0)
+    window_sums = sum_cs[..., high] - sum_cs[..., low]
+    window_counts = count_cs[..., high] - count_cs[..., low]
+    return np.divide(window_sums, window_counts,
+                     out=np.full(window_sums.shape, np.nan), where=window_counts > 0)
+
+
+def trend_line(x, y):
+    """Least-squares (slope, intercept) of y on x; None without two distinct x."""
+    if len(x) < 2 or np.ptp(x) == 0:
+        return None
+    slope, intercept = np.polyfit(x.astype("f8"), y, 1)
+    return float(slope), float(intercept)
+
+# ==================== TRENDS ====================
+
+def study_trends(study, today):
+    """Daily/weekly hours and rolling clarity per subject."""
+    if not len(study["day"]):
+        return None
+    start = int(study["day"].min())
+    span = max(today, int(study["day"].max())) - start + 1
+    offset = study["day"] - start
+
+    # Weeks start on Monday; epoch day 0 was a Thursday.
+    week = (study["day"] + 3) // 7
+    first_week = int(week.min())
+    weeks = int(week.max()) - first_week + 1
+    week_index = week - first_week
+    week_sessions = bucket_sums(week_index, None, weeks)
+    week_clarity = bucket_sums(week_index, study["clarity"], weeks)
+
+    subjects = study["labels"]
+    cells = study["subject"] * span + offset
+    clarity_sums = bucket_sums(cells, study["clarity"], len(subjects) * span).reshape(len(subjects), span)
+    clarity_counts = bucket_sums(cells, None, len(subjects) * span).reshape(len(subjects), span)
+    rolling = rolling_mean(clarity_sums, clarity_counts, CLARITY_WINDOW_DAYS)
+
+    return {
+        "total_hours": float(study["hours"].sum()),
+        "sessions": len(study["day"]),
+        "daily": {
+            "day": to_dates(np.arange(start, start + span)),
+            "hours": bucket_sums(offset, study["hours"], span),
+        },
+        "weekly": {
+            "week": to_dates(np.arange(first_week, first_week + weeks) * 7 - 3),
+            "hours": bucket_sums(week_index, study["hours"], weeks),
+            "sessions": week_sessions,
+            "clarity": np.divide(week_clarity, week_sessions,
+                                 out=np.full(weeks, np.nan), where=week_sessions > 0),
+        },
+        "clarity": {
+            "day": to_dates(np.arange(start, start + span)),
+            "by_subject": dict(zip(subjects, rolling)),
+        },
+    }
+
+
+def mock_trends(mocks):
+    """Mock percentages with a moving average and a fitted trend line."""
+    keep = mocks["total"] > 0
+    order = np.argsort(mocks["ts"][keep], kind="stable")
+    if not len(order):
+        return None
+    day = mocks["day"][keep][order]
+    exam_type = mocks["exam_type"][keep][order]
+    percentage = (mocks["score"][keep] / mocks["total"][keep] * 100)[order]
+    moving = rolling_mean(percentage, np.ones(len(percentage)), MOCK_WINDOW)
+    fit = trend_line(day, percentage)
+
+    exam_types = mocks["labels"]
+    type_counts = bucket_sums(exam_type, None, len(exam_types))
+    type_sums = bucket_sums(exam_type, percentage, len(exam_types))
+    return {
+        "day": to_dates(day),
+        "percentage": percentage,
+        "moving_average": moving,
+        "trend": None if fit is None else fit[0] * day + fit[1],
+        "slope_per_week": None if fit is None else fit[0] * 7,
+        "latest": float(percentage[-1]),
+        "by_type": {name: (int(count), float(total / count))
+                    for name, count, total in zip(exam_types, type_counts, type_sums) if count},
+    }
+
+
+def get_trends():
+    return compute_trends(pa_db.epoch_day(datetime.now().date()))
+
+
+@pa_db.cached_query
+def compute_trends(today):
+    """Every Analytics series, keyed "study" and "mocks" (None when empty).
+
+    Cached until the next write; treat the arrays as read-only.
+    """
+    if pa_columnar.active:
+        mirror = pa_columnar.get_mirror()
+        study, mocks = mirror.history_columns("study"), mirror.history_columns("mocks")
+    else:
+        study = load_columns(pa_db.get_study_history(), ("subject", "day", "hours", "clarity"),
+                             ("i8", "f8", "f8"))
+        mocks = load_columns(pa_db.get_mock_history(), ("exam_type", "ts", "day", "score", "total"),
+                             ("i8", "i8", "f8", "f8"))
+    return {"study": study_trends(study, today), "mocks": mock_trends(mocks)}
@@ -0,0 +1,176 @@
+"""Background detector for the "due in the next 3 days" task set.
+
+A daemon thread recomputes the urgent set of every database in use (one per
+user in multi-user mode) whenever a write comes through pa_db's listeners,
+when the date rolls over, and at least every POLL_SECONDS to catch writes
+from other processes. Reruns read the stored result for free and only
+query themselves if the snapshot is behind the data.
+
+Set ``AI_PA_NOTIFY=log`` to log each task entering the window, or
+``AI_PA_NOTIFY=desktop`` to also raise a desktop notification (notify-send
+on Linux, osascript on macOS).
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pa_db
+
+POLL_SECONDS = 60
+NOTIFY = os.environ.get("AI_PA_NOTIFY", "").lower()
+
+logger = logging.getLogger("ai_pa.urgent")
+
+
+def _today():
+    return pa_db.epoch_day(datetime.now().date())
+
+
+def _seconds_to_midnight():
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+# ==================== NOTIFICATIONS ====================
+
+def _applescript_string(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _desktop_command(title, message):
+    if sys.platform == "darwin" and shutil.which("osascript"):
+        script = f"display notification {_applescript_string(message)} with title {_applescript_string(title)}"
+        return ["osascript", "-e", script]
+    if shutil.which("notify-send"):
+        return ["notify-send", title, message]
+    return None
+
+
+def notify(task, mode=None):
+    """Announce one task that just entered the urgent window."""
+    mode = NOTIFY if mode is None else mode
+    if mode not in ("log", "desktop"):
+        return
+    message = f"{task[1]} (due {task[5]}, {task[6]} priority)"
+    logger.warning("Task entered the urgent window: %s", message)
+    if mode == "desktop":
+        command = _desktop_command("Kriti's PA Agent: task due soon", message)
+        if command:
+            try:
+                subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as exc:
+                logger.warning("desktop notification failed: %s", exc)
+
+# ==================== WATCHER ====================
+
+class UrgentWatcher(threading.Thread):
+    """Keeps ``snapshots[path]`` = (cache generation, day, urgent rows)
+    current for every database the app has asked about."""
+
+    def __init__(self, poll_seconds=POLL_SECONDS, notify=notify):
+        super().__init__(name="ai-pa-urgent", daemon=True)
+        self.poll_seconds = poll_seconds
+        self.snapshots = {}
+        self._notify = notify
+        self._watched = OrderedDict()
+        self._seen = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def watch(self, path):
+        """Start keeping ``path``'s urgent set (least recently watched
+        dropped beyond pa_db.MAX_OPEN_SHARDS)."""
+        with self._lock:
+            new = path not in self._watched
+            self._watched[path] = True
+            self._watched.move_to_end(path)
+            while len(self._watched) > pa_db.MAX_OPEN_SHARDS:
+                dropped, _ = self._watched.popitem(last=False)
+                self.snapshots.pop(dropped, None)
+                self._seen.pop(dropped, None)
+            if new:
+                self._dirty.add(path)
+        if new:
+            self._wake.set()
+
+    def on_write(self, table, row):
+        """pa_db write listener: any write may change the pending set."""
+        path = pa_db.current_path()
+        with self._lock:
+            if path in self._watched:
+                self._dirty.add(path)
+        self._wake.set()
+
+    def refresh(self, path):
+        with pa_db.scoped(path):
+            # Read the generation first: a write landing mid-query leaves the
+            # snapshot marked stale rather than silently wrong. Uncached, so
+            # the poll picks up other processes' writes.
+            generation = pa_db.query_cache.generation
+            today = _today()
+            rows = pa_db.poll_urgent_tasks()
+        seen = self._seen.get(path)
+        if seen is not None:
+            for row in rows:
+                if row[0] not in seen:
+                    self._notify(row)
+        self._seen[path] = {row[0] for row in rows}
+        self.snapshots[path] = (generation, today, rows)
+        return rows
+
+    def run(self):
+        timed_out = True
+        while not self._stopping:
+            self._wake.clear()
+            with self._lock:
+                # A timeout (poll or midnight) refreshes everything; a wake-up
+                # only the databases that were written or newly watched.
+                paths = list(self._watched) if timed_out else list(self._dirty)
+                self._dirty.clear()
+            for path in paths:
+                try:
+                    self.refresh(path)
+                except Exception:
+                    logger.exception("urgent-task refresh failed for %s", path)
+            timed_out = not self._wake.wait(min(self.poll_seconds, _seconds_to_midnight() + 1))
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def start():
+    """Start the process-wide watcher; later calls are no-ops."""
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                watcher = UrgentWatcher()
+                pa_db.write_listeners.append(watcher.on_write)
+                watcher.start()
+                _watcher = watcher
+    return _watcher
+
+
+def urgent_tasks():
+    """Pending tasks due in the next 3 days, from the watcher when current."""
+    if _watcher is None:
+        return pa_db.get_urgent_tasks()
+    path = pa_db.current_path()
+    _watcher.watch(path)
+    snapshot = _watcher.snapshots.get(path)
+    if snapshot and snapshot[0] == pa_db.query_cache.generation and snapshot[1] == _today():
+        return snapshot[2]
+    return pa_db.get_urgent_tasks()
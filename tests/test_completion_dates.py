@@ -0,0 +1,30 @@
+"""Tasks imported as completed are dated like the history they are."""
+
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db
+import pa_io
+
+
+def test_imported_completions_keep_their_dates(tmp_path):
+    pa_db.configure(str(tmp_path / "ai_pa.db"))
+    pa_db.init_db()
+    tasks = tmp_path / "tasks.jsonl"
+    records = [{"title": f"Filing {day}", "task_type": "Work - Content Creation", "status": "completed",
+                "due_date": f"2023-03-{day:02d}"} for day in (1, 2)]
+    records.append(dict(records[0], title="Brief", created_date="2023-03-05T09:00:00"))
+    tasks.write_text("".join(json.dumps(record) + "\n" for record in records))
+    assert pa_io.import_file("tasks", str(tasks))["inserted"] == 3
+
+    week = pa_db.analytics_summary(date.today() - timedelta(days=7), date.today())
+    assert week["completed"] == {}
+    assert pa_db.analytics_summary(date(2023, 3, 1), date(2023, 3, 31))["completed"] == {"Work": 3}
+    with pa_db.get_pool().connection() as conn:
+        stamped = [row[0] for row in conn.execute("SELECT completed_ts FROM tasks ORDER BY id")]
+    assert stamped == [pa_db.epoch_seconds("2023-03-01"), pa_db.epoch_seconds("2023-03-02"),
+                       pa_db.epoch_seconds("2023-03-05T09:00:00")]
@@ -0,0 +1,27 @@
+"""tools/check_query_plans.py passes against a synthetic database, and catches stale exemptions."""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import check_query_plans
+import gen_synthetic
+import pa_db
+
+
+def test_every_query_plan_is_indexed_or_exempt(tmp_path, capsys):
+    pa_db.configure(str(tmp_path / "plans.db"))
+    gen_synthetic.generate(500)
+    with pa_db.get_pool().connection() as conn:
+        conn.execute("ANALYZE")
+    assert check_query_plans.check(verbose=False) == 0, capsys.readouterr().out
+
+
+def test_stale_exemption_fails(monkeypatch):
+    exemptions = dict(pa_db.PLAN_EXEMPTIONS, recent_study={"SCAN study_progress": "no longer the plan"})
+    monkeypatch.setattr(pa_db, "PLAN_EXEMPTIONS", exemptions)
+    plan = ["SEARCH study_progress USING INDEX idx_study_date_ts (date_ts>?)"]
+    assert check_query_plans.violations("recent_study", plan) == ["stale exemption: SCAN study_progress"]
@@ -0,0 +1,23 @@
+"""Task ids are never reused once a task has been archived."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db
+
+
+def test_new_task_skips_archived_ids(tmp_path):
+    pa_db.configure(str(tmp_path / "ai_pa.db"))
+    pa_db.init_db()
+    first = pa_db.add_task("A", "", "Work - Content Creation", None, "High")
+    pa_db.complete_tasks([first])
+    second = pa_db.add_task("B", "", "Work - Content Creation", None, "High")
+    assert pa_db.archive_tasks(pa_db.epoch_seconds(datetime.now() + timedelta(days=1))) == 1
+    pa_db.undo(1)
+    third = pa_db.add_task("C", "", "Work - Content Creation", None, "High")
+    assert third > first
+    assert [row[:2] for row in pa_db.search("A")["rows"]] == [("task", first)]
+    assert pa_db.add_task("D", "", "Work - Content Creation", None, "High") == third + 1
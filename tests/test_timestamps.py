@@ -0,0 +1,52 @@
+"""Timestamps with a UTC offset are stored as local time, and keyed like SQLite reads them."""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db
+import pa_io
+import pa_scheduler
+
+SQLITE_KEYS = "SELECT CAST(strftime('%s', ?) AS INTEGER), CAST(strftime('%s', ?) AS INTEGER) / 86400"
+
+
+@pytest.fixture
+def local_tz(monkeypatch):
+    """Run in UTC+02:00 (no DST), whatever the machine's zone."""
+    monkeypatch.setenv("TZ", "Etc/GMT-2")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_timestamp_with_offset_is_stored_as_naive_local_time(local_tz):
+    assert pa_io._timestamp("2024-05-01T01:30:00+05:00") == "2024-04-30T22:30:00"
+    assert pa_io._timestamp("2024-05-01T10:00:00Z") == "2024-05-01T12:00:00"
+    assert pa_io._timestamp("2024-05-01T10:00:00") == "2024-05-01T10:00:00"
+
+
+def test_epoch_keys_match_sqlite():
+    conn = sqlite3.connect(":memory:")
+    for value in ("2024-05-01T01:30:00+05:00", "2024-05-01T10:00:00Z", "2024-02-30", "2024-05-01 10:00"):
+        assert (pa_db.epoch_seconds(value), pa_db.epoch_day(value)) == conn.execute(SQLITE_KEYS, (value, value)).fetchone()
+    assert pa_db.epoch_day("2024-13-01") is None
+
+
+def test_scheduler_loads_imported_offset_timestamps(tmp_path, local_tz):
+    pa_db.configure(str(tmp_path / "ai_pa.db"))
+    pa_db.init_db()
+    history = tmp_path / "history.jsonl"
+    history.write_text(json.dumps({"subject": "Torts", "date": "2024-05-01T01:30:00+05:00",
+                                   "hours_spent": 2, "clarity_rating": 4}) + "\n")
+    assert pa_io.import_file("study_progress", str(history))["inserted"] == 1
+    scheduler = pa_scheduler.StudyScheduler(pa_db.BAR_SUBJECTS)
+    scheduler.load()
+    assert scheduler._states["Torts"].last_studied == pa_db.epoch_seconds("2024-04-30T22:30:00")
@@ -0,0 +1,38 @@
+"""undo() only sees actions that changed something, and skips past ones it can't revert."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db
+
+
+def _tasks(tmp_path):
+    pa_db.configure(str(tmp_path / "ai_pa.db"))
+    pa_db.init_db()
+    return [pa_db.add_task(title, "", "Work - Content Creation", None, "High") for title in ("A", "B")]
+
+
+def test_completing_nothing_is_not_journaled(tmp_path):
+    first, second = _tasks(tmp_path)
+    assert pa_db.complete_tasks([first]) == 1
+    last = pa_db.get_last_event()
+    assert pa_db.complete_tasks([first]) == 0
+    assert pa_db.get_last_event() == last
+    assert len(pa_db.undo(1)["undone"]) == 1
+    assert first in [task[0] for task in pa_db.get_all_tasks()]
+
+
+def test_undo_skips_past_an_action_it_cannot_revert(tmp_path):
+    first, second = _tasks(tmp_path)
+    pa_db.complete_tasks([second])
+    assert pa_db.archive_tasks(pa_db.epoch_seconds(datetime.now() + timedelta(days=1))) == 1
+    for _ in range(2):
+        # Completing, then adding, the archived task.
+        result = pa_db.undo(1)
+        assert result["undone"] == [] and len(result["skipped"]) == 1
+    assert len(pa_db.undo(1)["undone"]) == 1
+    assert pa_db.get_all_tasks() == []
+    assert pa_db.undo(1) == {"undone": [], "skipped": []}
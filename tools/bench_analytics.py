@@ -0,0 +1,117 @@
+"""Analytics reads on SQLite vs the DuckDB mirror (pa_columnar).
+
+For every requested size a fresh database is filled by gen_synthetic and
+each Analytics read is timed with the read cache dropped before every call,
+once per backend. On SQLite the two aggregates read subject_stats; on the
+mirror they are GROUP BYs over the whole history, which is why the app
+keeps them on SQLite. For the mirror it also reports the initial full sync and
+the incremental sync after a single write (one journal event applied),
+which is what a rerun pays after logging a session.
+
+    python tools/bench_analytics.py --sizes 10k,100k,1m --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pa_columnar  # noqa: E402
+import pa_db  # noqa: E402
+import pa_trends  # noqa: E402
+import gen_synthetic  # noqa: E402
+
+
+def trends():
+    return pa_trends.compute_trends(pa_db.epoch_day(datetime.now().date()))
+
+
+WORKLOADS = {
+    "sqlite": {
+        "weak_subjects": pa_db.get_weak_subjects,
+        "subject_hours": pa_db.get_subject_hours,
+        "trends": trends,
+    },
+    "duckdb": {
+        "weak_subjects": lambda: pa_columnar.get_mirror().weak_subjects(),
+        "subject_hours": lambda: pa_columnar.get_mirror().subject_hours(),
+        "trends": trends,
+    },
+}
+
+# ==================== TIMING ====================
+
+def time_ms(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def time_reads(backend, runs):
+    results = {}
+    for name, fn in WORKLOADS[backend].items():
+        fn()
+        samples = []
+        for _ in range(runs):
+            # Dropping the cache bumps the generation, so the mirror polls
+            # the journal too: the cost of a read right after a write.
+            pa_db.query_cache.invalidate()
+            samples.append(time_ms(fn))
+        results[name] = statistics.median(samples)
+    return results
+
+
+def bench_size(label, rows, runs, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        pa_db.configure(os.path.join(tmp, f"analytics-{label}.db"))
+        gen_synthetic.generate(rows, seed)
+        result = {"size": label, "rows_per_table": rows, "sqlite": time_reads("sqlite", runs)}
+
+        pa_columnar.enable()
+        mirror = pa_columnar.get_mirror()
+        result["full_sync_ms"] = time_ms(mirror.sync)
+        pa_db.log_study("Evidence", 1.5, 3, "bench")
+        result["incremental_sync_ms"] = time_ms(mirror.sync)
+        result["duckdb"] = time_reads("duckdb", runs)
+        pa_columnar.disable()
+        pa_db.get_pool().close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k,100k", help="comma-separated sizes (rows per table)")
+    parser.add_argument("--runs", type=int, default=10, help="timed calls per read and backend")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    if pa_columnar.duckdb is None or pa_columnar.pa is None:
+        parser.error("duckdb and pyarrow are not installed (pip install duckdb pyarrow)")
+    results = []
+    for label in args.sizes.split(","):
+        label = label.strip()
+        print(f"benchmarking {label}...", file=sys.stderr)
+        results.append(bench_size(label, gen_synthetic.parse_size(label), args.runs, args.seed))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['size']}: full sync {r['full_sync_ms']:.0f} ms, "
+              f"incremental sync {r['incremental_sync_ms']:.1f} ms")
+        for name in WORKLOADS["sqlite"]:
+            sqlite_ms, duckdb_ms = r["sqlite"][name], r["duckdb"][name]
+            print(f"  {name:<14} sqlite {sqlite_ms:8.2f} ms  duckdb {duckdb_ms:8.2f} ms  "
+                  f"x{sqlite_ms / duckdb_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Per-rerun query overhead: legacy connect-per-call vs the pooled data layer.
+
+Replays the queries one Dashboard rerun issues (page body plus sidebar
+Quick Stats) against a scratch database and reports the mean cost of a
+rerun for each strategy. Uncached variants drop the read cache first, as
+a rerun right after a write would.
+
+    python tools/bench_rerun.py --rows 2000 --reruns 200
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db  # noqa: E402
+
+# ==================== LEGACY PATH ====================
+
+def legacy_init_db(path):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    for ddl in pa_db.SCHEMA:
+        c.execute(ddl)
+    conn.commit()
+    return conn
+
+
+def legacy_query(path, sql, params=()):
+    conn = legacy_init_db(path)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_rerun(path):
+    today = datetime.now().date()
+    window = (str(today), str(today + timedelta(days=3)))
+    legacy_init_db(path).close()
+    legacy_query(path, 'SELECT * FROM tasks WHERE status = "pending" ORDER BY due_date ASC')
+    legacy_query(path, 'SELECT * FROM tasks WHERE category = "Work" AND status = "pending" ORDER BY due_date ASC')
+    legacy_query(path, 'SELECT * FROM tasks WHERE category = "Bar Prep" AND status = "pending" ORDER BY due_date ASC')
+    legacy_query(path, 'SELECT * FROM tasks WHERE status = "pending" AND due_date BETWEEN ? AND ? ORDER BY due_date ASC', window)
+    legacy_query(path, 'SELECT * FROM tasks WHERE status = "pending" ORDER BY due_date ASC')
+    legacy_query(path, 'SELECT * FROM tasks WHERE status = "pending" AND due_date BETWEEN ? AND ? ORDER BY due_date ASC', window)
+    legacy_query(path, 'SELECT * FROM study_progress ORDER BY date DESC LIMIT 20')
+    legacy_query(path, 'SELECT subject, AVG(clarity_rating), COUNT(*) FROM study_progress GROUP BY subject ORDER BY 2 ASC')
+
+# ==================== POOLED PATH ====================
+
+def pooled_rerun(_path):
+    pa_db.query_cache.invalidate()
+    pa_db.init_db()
+    pa_db.get_all_tasks()
+    pa_db.get_tasks_by_type("work")
+    pa_db.get_tasks_by_type("bar")
+    pa_db.get_urgent_tasks()
+    pa_db.get_all_tasks()
+    pa_db.get_urgent_tasks()
+    pa_db.get_study_progress()
+    pa_db.get_weak_subjects()
+
+
+def snapshot_rerun(_path):
+    pa_db.query_cache.invalidate()
+    pa_db.init_db()
+    pa_db.get_dashboard_snapshot()
+    pa_db.get_urgent_tasks()
+
+
+def cached_rerun(_path):
+    pa_db.init_db()
+    pa_db.get_dashboard_snapshot()
+    pa_db.get_urgent_tasks()
+
+# ==================== DRIVER ====================
+
+def seed(rows):
+    today = datetime.now().date()
+    for i in range(rows):
+        task_type = "Work - Content Creation" if i % 2 else "Bar Prep - Essay"
+        pa_db.add_task(f"Task {i}", "", task_type, str(today + timedelta(days=i % 60)), "Medium")
+        if i % 3 == 0:
+            pa_db.complete_task(i + 1)
+        pa_db.log_study("Evidence" if i % 4 else "Torts", 1.5, 1 + i % 5, "")
+
+
+def time_reruns(fn, path, reruns):
+    fn(path)
+    start = time.perf_counter()
+    for _ in range(reruns):
+        fn(path)
+    return (time.perf_counter() - start) / reruns * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--reruns", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        pa_db.configure(path)
+        seed(args.rows)
+        results = {
+            "rows": args.rows,
+            "reruns": args.reruns,
+            "legacy_ms_per_rerun": time_reruns(legacy_rerun, path, args.reruns),
+            "pooled_ms_per_rerun": time_reruns(pooled_rerun, path, args.reruns),
+            "snapshot_ms_per_rerun": time_reruns(snapshot_rerun, path, args.reruns),
+            "cached_ms_per_rerun": time_reruns(cached_rerun, path, args.reruns),
+            "cache": pa_db.cache_stats(),
+        }
+        pa_db.get_pool().close()
+
+    results["speedup"] = results["legacy_ms_per_rerun"] / results["pooled_ms_per_rerun"]
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"rows={results['rows']} reruns={results['reruns']}")
+        print(f"legacy (connect + DDL per call): {results['legacy_ms_per_rerun']:.3f} ms/rerun")
+        print(f"pooled (shared connections):     {results['pooled_ms_per_rerun']:.3f} ms/rerun")
+        print(f"pooled + dashboard snapshot:     {results['snapshot_ms_per_rerun']:.3f} ms/rerun")
+        print(f"cached snapshot (no writes):     {results['cached_ms_per_rerun']:.3f} ms/rerun")
+        print(f"speedup: {results['speedup']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
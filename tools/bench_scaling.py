@@ -0,0 +1,199 @@
+"""Scaling benchmark for the data layer and each app page.
+
+For every requested size a fresh database is filled by gen_synthetic and
+its completed tasks are archived (as the maintenance thread would), then
+every data function is timed with the read cache dropped before each call,
+and each page of ai_pa_system.py is rendered headlessly with Streamlit's
+AppTest (skipped when streamlit is not installed); the Search page is also
+timed running SEARCH_TERM. Results are written as JSON so runs can be
+compared over time.
+
+    python tools/bench_scaling.py --sizes 10k,100k --out bench_scaling.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The app script starts pa_backup's scheduler; benchmarks mustn't back up.
+os.environ["AI_PA_BACKUP_HOURS"] = "0"
+
+import pa_archive  # noqa: E402
+import pa_db  # noqa: E402
+import pa_trends  # noqa: E402
+import gen_synthetic  # noqa: E402
+
+try:
+    from streamlit.testing.v1 import AppTest
+except ImportError:
+    AppTest = None
+
+APP_PATH = os.path.join(ROOT, "ai_pa_system.py")
+PAGES = ["📊 Dashboard", "💼 Work Tasks", "📚 Bar Prep", "📈 Analytics", "🔍 Search", "🗄️ Archive"]
+# Matches most synthetic rows, the worst case for ranking.
+SEARCH_TERM = "Session"
+
+# ==================== WORKLOADS ====================
+
+def query_workloads():
+    """Name -> zero-argument callable for every read the app performs."""
+    first_page = pa_db.get_task_page("work", 25)
+    first_archive = pa_db.get_archive_page(25)
+    return {
+        "get_all_tasks": pa_db.get_all_tasks,
+        "get_tasks_by_type(work)": lambda: pa_db.get_tasks_by_type("work"),
+        "get_tasks_by_type(bar)": lambda: pa_db.get_tasks_by_type("bar"),
+        "get_task_page(work, 25)": lambda: pa_db.get_task_page("work", 25),
+        "get_task_page(work, 25, after)": lambda: pa_db.get_task_page(
+            "work", 25, after=first_page["last_key"]),
+        "get_urgent_tasks": pa_db.get_urgent_tasks,
+        "get_dashboard_snapshot": pa_db.get_dashboard_snapshot,
+        "get_study_progress": pa_db.get_study_progress,
+        "get_mock_scores": pa_db.get_mock_scores,
+        "get_weak_subjects": pa_db.get_weak_subjects,
+        "get_subject_hours": pa_db.get_subject_hours,
+        "get_trends": pa_trends.get_trends,
+        "analytics_summary": pa_db.analytics_summary,
+        "analytics_summary(30 days)": lambda: pa_db.analytics_summary(
+            date.today() - timedelta(days=30), date.today()),
+        f"search({SEARCH_TERM})": lambda: pa_db.search(SEARCH_TERM),
+        f"search({SEARCH_TERM}, page 2)": lambda: pa_db.search(SEARCH_TERM, offset=20),
+        "get_archive_page(25)": lambda: pa_db.get_archive_page(25),
+        "get_archive_page(25, older)": lambda: pa_db.get_archive_page(
+            25, older=first_archive["last_key"]),
+    }
+
+
+def write_workloads():
+    due = str(datetime.now().date() + timedelta(days=1))
+    return {
+        "add_task": lambda: pa_db.add_task("Bench task", "", "Work - Content Creation", due, "Low"),
+        "complete_task": lambda: pa_db.complete_task(
+            pa_db.add_task("Bench task", "", "Bar Prep - Essay", due, "Low")),
+        "log_study": lambda: pa_db.log_study("Evidence", 1.5, 3, "bench"),
+        "log_mock": lambda: pa_db.log_mock("MBE Section", 20, 33, "bench"),
+    }
+
+# ==================== TIMING ====================
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+    }
+
+
+def time_call(fn, runs, cold=True):
+    fn()
+    samples = []
+    for _ in range(runs):
+        if cold:
+            pa_db.query_cache.invalidate()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def time_pages(runs):
+    search = f"🔍 Search: {SEARCH_TERM}"
+    if AppTest is None:
+        return {page: {"skipped": "streamlit not installed"} for page in [*PAGES, search]}
+    results = {}
+    for page in PAGES:
+        samples, searches = [], []
+        for _ in range(runs + 1):
+            pa_db.query_cache.invalidate()
+            at = AppTest.from_file(APP_PATH, default_timeout=120)
+            at.run()
+            start = time.perf_counter()
+            at.sidebar.radio[0].set_value(page).run()
+            samples.append((time.perf_counter() - start) * 1000)
+            if at.exception:
+                raise RuntimeError(f"{page} raised: {at.exception}")
+            if page == "🔍 Search":
+                start = time.perf_counter()
+                at.text_input(key="search_query").input(SEARCH_TERM).run()
+                searches.append((time.perf_counter() - start) * 1000)
+                if at.exception:
+                    raise RuntimeError(f"{search} raised: {at.exception}")
+        results[page] = summarize(samples[1:])
+        if searches:
+            results[search] = summarize(searches[1:])
+    return results
+
+# ==================== DRIVER ====================
+
+def bench_size(label, rows, runs, render_runs, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        pa_db.configure(os.path.join(tmp, f"scaling-{label}.db"))
+        start = time.perf_counter()
+        gen_synthetic.generate(rows, seed)
+        results = [{"size": label, "rows_per_table": rows, "kind": "generate",
+                    "name": "gen_synthetic", "seconds": time.perf_counter() - start}]
+        start = time.perf_counter()
+        archived, _ = pa_archive.maintain(older_than_days=0)
+        results.append({"size": label, "rows_per_table": rows, "kind": "generate",
+                        "name": f"archive ({archived} tasks)", "seconds": time.perf_counter() - start})
+        for name, fn in query_workloads().items():
+            results.append({"size": label, "rows_per_table": rows, "kind": "query",
+                            "name": name, **time_call(fn, runs)})
+        for name, fn in write_workloads().items():
+            results.append({"size": label, "rows_per_table": rows, "kind": "write",
+                            "name": name, **time_call(fn, runs, cold=False)})
+        for page, stats in time_pages(render_runs).items():
+            results.append({"size": label, "rows_per_table": rows, "kind": "render",
+                            "name": page, **stats})
+        pa_db.get_pool().close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k,100k",
+                        help="comma-separated sizes (rows per table), e.g. 10k,100k,1m")
+    parser.add_argument("--runs", type=int, default=20, help="timed calls per data function")
+    parser.add_argument("--render-runs", type=int, default=3, help="timed renders per page")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "seed": args.seed,
+            "runs": args.runs,
+        },
+        "results": [],
+    }
+    for label in args.sizes.split(","):
+        label = label.strip()
+        rows = gen_synthetic.parse_size(label)
+        print(f"benchmarking {label} ({rows} rows per table)...", file=sys.stderr)
+        report["results"].extend(bench_size(label, rows, args.runs, args.render_runs, args.seed))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Concurrent write throughput: per-writer commits vs the single-writer queue.
+
+Each of N threads logs study sessions as fast as it can. In "direct" mode
+every thread has its own connection and commits each write on its own (how
+separate sessions wrote before the write queue); in "queue" mode they call
+pa_db.log_study, which goes through the group-committing WriteQueue.
+Reports writes/s, per-write latency and lock errors for 1, 8 and 32
+writers by default.
+
+    python tools/bench_writers.py --writers 1,8,32 --writes 500
+    python tools/bench_writers.py --synchronous NORMAL   # default: what the app's writer uses
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db  # noqa: E402
+
+INSERT = '''INSERT INTO study_progress (subject, date, hours_spent, clarity_rating, notes)
+            VALUES (?, ?, ?, ?, ?)'''
+
+# ==================== WRITERS ====================
+
+def direct_writer(path, writes, latencies, errors):
+    conn = sqlite3.connect(path, timeout=5.0)
+    for pragma in pa_db.PRAGMAS:
+        conn.execute(pragma)
+    try:
+        for i in range(writes):
+            start = time.perf_counter()
+            try:
+                with conn:
+                    conn.execute(INSERT, ("Evidence", datetime.now().isoformat(), 1.0, 3, f"direct {i}"))
+            except sqlite3.OperationalError:
+                errors.append(i)
+                continue
+            latencies.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+
+
+def queue_writer(path, writes, latencies, errors):
+    for i in range(writes):
+        start = time.perf_counter()
+        try:
+            pa_db.log_study("Evidence", 1.0, 3, f"queue {i}")
+        except sqlite3.OperationalError:
+            errors.append(i)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+MODES = {"direct": direct_writer, "queue": queue_writer}
+
+# ==================== DRIVER ====================
+
+def run(mode, path, writers, writes):
+    latencies, errors = [], []
+    threads = [threading.Thread(target=MODES[mode], args=(path, writes, latencies, errors))
+               for _ in range(writers)]
+    writer = pa_db.get_pool().writer
+    batches_before = writer.batches
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    result = {
+        "mode": mode,
+        "writers": writers,
+        "writes": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "writes_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else None,
+    }
+    if mode == "queue":
+        batches = writer.batches - batches_before
+        result["commits"] = batches
+        result["writes_per_commit"] = len(latencies) / batches if batches else None
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", default="1,8,32", help="comma-separated writer thread counts")
+    parser.add_argument("--writes", type=int, default=500, help="writes per writer thread")
+    parser.add_argument("--synchronous", choices=["OFF", "NORMAL", "FULL"], default=pa_db.WRITER_SYNCHRONOUS.upper(),
+                        help="default: the app writer's (AI_PA_WRITER_SYNCHRONOUS, FULL)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    pa_db.PRAGMAS = tuple(f"PRAGMA synchronous = {args.synchronous}" if "synchronous" in pragma else pragma
+                          for pragma in pa_db.PRAGMAS)
+    pa_db.WRITER_SYNCHRONOUS = args.synchronous
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for writers in (int(n) for n in args.writers.split(",")):
+            for mode in MODES:
+                path = os.path.join(tmp, f"writers-{mode}-{writers}.db")
+                pa_db.configure(path)
+                results.append(run(mode, path, writers, args.writes))
+                pa_db.get_pool().close()
+
+    if args.json:
+        print(json.dumps({"synchronous": args.synchronous, "results": results}, indent=2))
+        return
+    print(f"synchronous={args.synchronous} writes/writer={args.writes}")
+    for r in results:
+        extra = f"  {r['writes_per_commit']:.1f} writes/commit" if r.get("writes_per_commit") else ""
+        print(f"{r['mode']:>6} x{r['writers']:<3} {r['writes_per_s']:9.0f} writes/s  "
+              f"p50 {r['p50_ms']:.2f} ms  p95 {r['p95_ms']:.2f} ms  errors {r['errors']}{extra}")
+
+
+if __name__ == "__main__":
+    main()
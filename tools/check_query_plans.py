@@ -0,0 +1,90 @@
+"""Query-plan regression check for every query in pa_db.QUERIES.
+
+Runs EXPLAIN QUERY PLAN on each named query and exits non-zero if any of
+them scans a table (``SCAN <table>``, with or without an index), uses an
+automatic index or sorts in a temp b-tree, unless pa_db.PLAN_EXEMPTIONS
+lists that exact plan line for the query with a reason. An exemption the
+query's plan no longer contains fails too, so the list can't go stale.
+
+    python tools/check_query_plans.py            # fresh scratch database
+    python tools/check_query_plans.py --db ai_pa.db
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db  # noqa: E402
+
+# Plan lines that need an exemption.
+COSTLY = re.compile(r"^SCAN |^USE TEMP B-TREE|USING AUTOMATIC")
+# Scans of a FROM-less SELECT's single row or of a subquery's result rows,
+# whose own plan lines are checked separately.
+STRUCTURAL = re.compile(r"^SCAN (CONSTANT ROW|\(subquery-\d+\))$")
+NAMED_PARAM = re.compile(r":(\w+)")
+
+
+def explain(conn, sql):
+    named = NAMED_PARAM.findall(sql)
+    params = dict.fromkeys(named) if named else (None,) * sql.count("?")
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def violations(name, plan):
+    exemptions = pa_db.PLAN_EXEMPTIONS.get(name, {})
+    problems = []
+    for detail in plan:
+        if COSTLY.search(detail) and not STRUCTURAL.match(detail) and detail not in exemptions:
+            problems.append(f"not exempted: {detail}")
+    for detail in exemptions:
+        if detail not in plan:
+            problems.append(f"stale exemption: {detail}")
+    return problems
+
+
+def check(verbose=True):
+    failures = 0
+    for name in pa_db.PLAN_EXEMPTIONS.keys() - pa_db.QUERIES.keys():
+        print(f"FAIL {name}\n    -> exemption for a query that doesn't exist")
+        failures += 1
+    with pa_db.get_pool().connection() as conn:
+        for name, sql in pa_db.QUERIES.items():
+            plan = explain(conn, sql)
+            problems = violations(name, plan)
+            failures += bool(problems)
+            if verbose or problems:
+                print(f"{'FAIL' if problems else 'ok  '} {name}")
+                for detail in plan:
+                    print(f"       {detail}")
+                for problem in problems:
+                    print(f"    -> {problem}")
+                for detail, reason in pa_db.PLAN_EXEMPTIONS.get(name, {}).items():
+                    if verbose and detail in plan:
+                        print(f"    exempt: {detail} ({reason})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="check plans against an existing database file")
+    parser.add_argument("--quiet", action="store_true", help="only print failures")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pa_db.configure(args.db or os.path.join(tmp, "plans.db"))
+        failures = check(verbose=not args.quiet)
+        pa_db.get_pool().close()
+
+    if failures:
+        print(f"{failures} quer{'y' if failures == 1 else 'ies'} failed the plan check")
+        return 1
+    print(f"no plan regressions across {len(pa_db.QUERIES)} queries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Seeded synthetic history for sizing and benchmarking the data layer.
+
+Fills tasks, study_progress and mock_scores with plausible data: due dates
+spread over the past two years with a short future horizon, mostly
+completed history, per-subject clarity that improves over time, and mock
+percentages that trend upward, each mock tagged with one to three subjects.
+
+    python tools/gen_synthetic.py --db /tmp/bench.db --rows 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pa_db  # noqa: E402
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CHUNK_SIZE = 10_000
+HISTORY_DAYS = 730
+
+PRIORITY_WEIGHTS = [25, 40, 25, 10]
+MOCK_TOTALS = {
+    "Essay (Single)": 100,
+    "Essay (Multiple)": 300,
+    "Performance Test": 100,
+    "MBE Section": 33,
+    "Full MBE (200q)": 200,
+    "Full Practice Exam": 2000,
+}
+TOPICS = ["Independent Directors", "Corporate Governance", "Contract Drafting",
+          "Legal Research", "Moot Court", "Arbitration", "Compliance"]
+
+# ==================== ROW GENERATORS ====================
+
+def task_rows(rng, count, now):
+    today = now.date()
+    for i in range(count):
+        if rng.random() < 0.5:
+            task_type = rng.choice(pa_db.WORK_TASK_TYPES)
+            category = "Work"
+            title = f"{task_type.split(' - ')[1]}: {rng.choice(TOPICS)} #{i}"
+        else:
+            task_type = rng.choice(pa_db.BAR_TASK_TYPES)
+            category = "Bar Prep"
+            title = f"{rng.choice(pa_db.BAR_SUBJECTS)} {task_type.split(' - ')[1].lower()} #{i}"
+        due = today + timedelta(days=int(rng.triangular(-HISTORY_DAYS, 60, 0)))
+        created = datetime.combine(due, datetime.min.time()) - timedelta(
+            days=rng.randint(1, 21), seconds=rng.randint(0, 86399))
+        status = "completed" if due < today and rng.random() < 0.9 else "pending"
+        yield (
+            title,
+            "" if rng.random() < 0.5 else f"Notes for task {i}",
+            category,
+            task_type,
+            str(due),
+            rng.choices(pa_db.PRIORITIES, PRIORITY_WEIGHTS)[0],
+            status,
+            created.isoformat(),
+        )
+
+
+def study_rows(rng, count, now):
+    difficulty = {subject: rng.uniform(2.0, 3.6) for subject in pa_db.BAR_SUBJECTS}
+    focus = [rng.uniform(0.5, 2.0) for _ in pa_db.BAR_SUBJECTS]
+    for i in range(count):
+        subject = rng.choices(pa_db.BAR_SUBJECTS, focus)[0]
+        age = rng.random()
+        when = now - timedelta(seconds=int(age * HISTORY_DAYS * 86400))
+        progress = 1.0 - age
+        clarity = min(5, max(1, round(rng.gauss(difficulty[subject] + 1.2 * progress, 0.9))))
+        hours = min(8.0, max(0.5, round(rng.gammavariate(2.0, 0.9) * 2) / 2))
+        yield (subject, when.isoformat(), hours, clarity, f"Session {i} on {subject}")
+
+
+def mock_rows(rng, count, now):
+    for i in range(count):
+        exam_type = rng.choice(pa_db.MOCK_EXAM_TYPES)
+        total = MOCK_TOTALS[exam_type]
+        age = rng.random()
+        when = now - timedelta(seconds=int(age * HISTORY_DAYS * 86400))
+        pct = min(1.0, max(0.0, rng.gauss(0.58 + 0.15 * (1.0 - age), 0.08)))
+        subjects = rng.sample(pa_db.BAR_SUBJECTS, rng.randint(1, 3))
+        yield (exam_type, round(total * pct), total, when.isoformat(), f"Mock {i}: {', '.join(subjects)}")
+
+# ==================== LOADER ====================
+
+INSERTS = {
+    "tasks": (f'''INSERT INTO tasks (id, title, description, category, task_type, due_date,
+                 priority, status, created_date)
+                 VALUES ({pa_db.NEXT_ID["tasks"]}, ?, ?, ?, ?, ?, ?, ?, ?)''', task_rows),
+    "study_progress": ('''INSERT INTO study_progress (subject, date, hours_spent, clarity_rating, notes)
+                 VALUES (?, ?, ?, ?, ?)''', study_rows),
+    "mock_scores": ('''INSERT INTO mock_scores (exam_type, score, total_points, date, notes)
+                 VALUES (?, ?, ?, ?, ?)''', mock_rows),
+}
+
+
+def generate(rows, seed=42, now=None, tables=tuple(INSERTS)):
+    """Insert ``rows`` synthetic rows into each table of the configured db."""
+    now = now or datetime.now()
+    counts = {}
+    with pa_db.get_pool().connection() as conn:
+        for table in tables:
+            sql, make_rows = INSERTS[table]
+            rng = random.Random(f"{seed}:{table}")
+            source = make_rows(rng, rows, now)
+            counts[table] = 0
+            last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            while counts[table] < rows:
+                chunk = [next(source) for _ in range(min(CHUNK_SIZE, rows - counts[table]))]
+                with conn:
+                    conn.executemany(sql, chunk)
+                    if table == "mock_scores":
+                        first_id, last_id = last_id, conn.execute("SELECT MAX(id) FROM mock_scores").fetchone()[0]
+                        pa_db.tag_mocks_from_notes(conn, first_id, last_id)
+                counts[table] += len(chunk)
+    pa_db.query_cache.invalidate()
+    return counts
+
+
+def parse_size(value):
+    return SIZES.get(value.lower()) or int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="database file to fill (created if missing)")
+    parser.add_argument("--rows", type=parse_size, default=SIZES["10k"],
+                        help="rows per table: a number or one of " + ", ".join(SIZES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    pa_db.configure(args.db)
+    start = time.perf_counter()
+    counts = generate(args.rows, args.seed)
+    pa_db.get_pool().close()
+    print(f"generated {counts} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Concurrent-session load test for ai_pa_system.py, entirely in-process.
+
+Each simulated user is a Streamlit AppTest session on its own thread. All of
+them share this process's pa_db (one connection pool, one writer, one read
+cache) and one database file, as sessions of a single `streamlit run`
+server do. Every user performs a random mix of actions:
+
+    page      switch the sidebar radio between the four main pages
+    work_form / bar_form / study_form / mock_form
+              fill in and submit that form
+    done      tick up to two tasks in a list and complete them
+
+and each rerun is timed. For every user count the harness reports p50/p95/
+p99 rerun latency, reruns/s across all users, app exceptions and how many
+of those were SQLite lock errors.
+
+    python tools/load_test.py --users 1,8,32 --actions 40
+    python tools/load_test.py --users 16 --rows 10k --json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# The app script starts pa_backup's scheduler; benchmarks mustn't back up.
+os.environ["AI_PA_BACKUP_HOURS"] = "0"
+
+import pa_db  # noqa: E402
+import gen_synthetic  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.testing.v1 import AppTest, app_test  # noqa: E402
+
+APP_PATH = os.path.join(ROOT, "ai_pa_system.py")
+PAGES = ["📊 Dashboard", "💼 Work Tasks", "📚 Bar Prep", "📈 Analytics"]
+# Relative frequency of each action; reads dominate, as in real use.
+ACTIONS = {"page": 6, "work_form": 1, "bar_form": 1, "study_form": 2, "mock_form": 1, "done": 1}
+
+# ==================== SHARED RUNTIME ====================
+
+def share_runtime():
+    """Let AppTest sessions run side by side.
+
+    Each AppTest run installs a mock Runtime singleton and clears it when
+    it finishes, which pulls it out from under any session still running.
+    Fall back to one shared mock, built the way AppTest builds its own,
+    whenever no run has one installed.
+    """
+    shared = app_test.MagicMock(spec=Runtime)
+    shared.media_file_mgr = app_test.MediaFileManager(app_test.MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+# ==================== SIMULATED USER ====================
+
+def _labelled(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+class SimulatedUser:
+    """One browser session driving the app through AppTest."""
+
+    def __init__(self, rng, timeout):
+        self.rng = rng
+        self.timeout = timeout
+        self.latencies = []
+        self.errors = []
+        self.lost = 0
+        self.connect()
+
+    def connect(self):
+        """A fresh browser tab on the Dashboard."""
+        self.at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        self.current = PAGES[0]
+
+    def _run(self, element=None):
+        start = time.perf_counter()
+        (element or self.at).run()
+        self.latencies.append(time.perf_counter() - start)
+        self.errors.extend(str(exc.message) for exc in self.at.exception)
+
+    def open(self, page):
+        if page != self.current:
+            self.current = page
+            self._run(self.at.sidebar.radio[0].set_value(page))
+
+    def act(self, action):
+        getattr(self, action)()
+
+    def page(self):
+        self.open(self.rng.choice([page for page in PAGES if page != self.current]))
+
+    def _add_task(self, page):
+        self.open(page)
+        _labelled(self.at.text_input, "Task Title").input(f"Load test task {self.rng.randrange(10 ** 6)}")
+        self._run(_labelled(self.at.button, "➕ Add Task").click())
+
+    def work_form(self):
+        self._add_task("💼 Work Tasks")
+
+    def bar_form(self):
+        self._add_task("📚 Bar Prep")
+
+    def study_form(self):
+        self.open("📚 Bar Prep")
+        _labelled(self.at.selectbox, "📚 Subject").set_value(self.rng.choice(pa_db.BAR_SUBJECTS))
+        _labelled(self.at.slider, "🧠 Clarity (1=Confused, 5=Mastered)").set_value(self.rng.randint(1, 5))
+        self._run(_labelled(self.at.button, "📚 Log Session").click())
+
+    def mock_form(self):
+        self.open("📚 Bar Prep")
+        _labelled(self.at.number_input, "📊 Score").set_value(self.rng.randint(40, 100))
+        self._run(_labelled(self.at.button, "🎯 Log Score").click())
+
+    def done(self):
+        key = self.rng.choice(["work_list", "bar_list"])
+        self.open("💼 Work Tasks" if key == "work_list" else "📚 Bar Prep")
+        chosen = [element for element in self.at.multiselect if element.key == f"{key}_chosen"]
+        if not chosen or not chosen[0].options:
+            return
+        # AppTest matches multiselect values against the displayed labels.
+        chosen[0].set_value(self.rng.sample(chosen[0].options, min(2, len(chosen[0].options))))
+        self._run(_labelled(self.at.button, "✓ Complete selected").click())
+
+    def session(self, actions, think):
+        self._run()
+        names, weights = list(ACTIONS), list(ACTIONS.values())
+        for action in self.rng.choices(names, weights, k=actions):
+            try:
+                self.act(action)
+            except (StopIteration, IndexError):
+                # The last rerun died part-way (see errors), so the widget
+                # isn't on screen; reload the tab like a user would.
+                self.lost += 1
+                self.connect()
+                self._run()
+            if think:
+                time.sleep(self.rng.uniform(0, 2 * think))
+
+# ==================== DRIVER ====================
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))] * 1000 if samples else None
+
+
+def run_load(users, actions, think, timeout, seed):
+    sessions = [SimulatedUser(random.Random(seed * 1000 + i), timeout) for i in range(users)]
+    failures = []
+
+    def drive(user):
+        try:
+            user.session(actions, think)
+        except Exception as exc:
+            failures.append(repr(exc))
+
+    threads = [threading.Thread(target=drive, args=(user,)) for user in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for user in sessions for latency in user.latencies)
+    errors = [error for user in sessions for error in user.errors]
+    return {
+        "users": users,
+        "reruns": len(latencies),
+        "seconds": elapsed,
+        "reruns_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "app_errors": len(errors),
+        "lock_errors": sum("locked" in error or "busy" in error for error in errors),
+        "reloads": sum(user.lost for user in sessions),
+        "harness_failures": failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", default="1,4,16", help="comma-separated concurrent user counts")
+    parser.add_argument("--actions", type=int, default=30, help="actions per simulated user")
+    parser.add_argument("--rows", default="2000", help="rows per table seeded before each run")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's actions")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+
+    share_runtime()
+    rows = gen_synthetic.parse_size(args.rows)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for users in (int(n) for n in args.users.split(",")):
+            print(f"{users} users...", file=sys.stderr)
+            pa_db.configure(os.path.join(tmp, f"load-{users}.db"))
+            gen_synthetic.generate(rows, args.seed)
+            results.append(run_load(users, args.actions, args.think_ms / 1000, args.timeout, args.seed))
+            pa_db.get_pool().close()
+
+    if args.json:
+        print(json.dumps({"rows_per_table": rows, "actions_per_user": args.actions, "results": results},
+                         indent=2))
+        return
+    print(f"{rows} rows/table, {args.actions} actions/user")
+    for r in results:
+        print(f"{r['users']:>4} users  {r['reruns_per_s']:7.1f} reruns/s  p50 {r['p50_ms']:7.1f} ms  "
+              f"p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  "
+              f"errors {r['app_errors']} (locks {r['lock_errors']})  reloads {r['reloads']}")
+        for failure in r["harness_failures"]:
+            print(f"      harness: {failure}")
+
+
+if __name__ == "__main__":
+    main()